@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Lexer scaling benchmark.
+Tokenizes generated Shard sources of growing size and reports throughput,
+which should stay flat (linear total time) from 1 MB upwards.
+
+Usage: python -m benchmarks.bench_lexer [max_megabytes]
+"""
+
+import sys
+import time
+
+from src.shard.lexer import Lexer, TokenTypes
+
+UNIT = '''// generated component
+type Point{n} from Base {{
+    pub x: float = 1.5;
+    pub y: float = -2.0;
+    /* label for
+       debugging */
+    name: string = "point \\"{n}\\"";
+    pub move(dx: float, dy: float) -> Point{n} {{
+        x += dx; y -= dy;
+        if (x >= 10 == (y != 0)) {{ return self; }}
+        return move(dx * 2, dy / 2);
+    }}
+}}
+'''
+
+
+def generate_source(size: int) -> str:
+    """Generate a Shard source of at least `size` characters"""
+    parts = []
+    total = 0
+    n = 0
+    while total < size:
+        unit = UNIT.format(n=n)
+        parts.append(unit)
+        total += len(unit)
+        n += 1
+    return ''.join(parts)
+
+
+def count_tokens(source: str) -> int:
+    """Tokenize the whole source and return the number of tokens"""
+    lexer = Lexer(source)
+    count = 0
+    while lexer.get_next_token().type != TokenTypes.EOF:
+        count += 1
+    return count
+
+
+def main():
+    max_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    print(f"{'size':>8} | {'tokens':>9} | {'seconds':>8} | {'MB/s':>6}")
+    mb = 1
+    while mb <= max_mb:
+        source = generate_source(mb * 1024 * 1024)
+        start = time.perf_counter()
+        tokens = count_tokens(source)
+        elapsed = time.perf_counter() - start
+        print(f"{mb:>6}MB | {tokens:>9} | {elapsed:>8.3f} | {mb / elapsed:>6.2f}")
+        mb *= 2
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Parser benchmark.
+Parses generated Shard programs of growing size and reports throughput.
+
+Usage: python -m benchmarks.bench_parser [max_kilobytes]
+"""
+
+import sys
+import time
+
+from src.shard.lexer import Lexer
+from src.shard.parser import Parser
+
+UNIT = '''type Point{n} from Base {{
+    x: float = 1.5;
+    y: float = 2.0;
+    init() {{
+        print("point {n}");
+    }}
+    scale(factor: float) -> Point{n} {{
+        x = x * factor + offset.x;
+        y = y * factor;
+        if (x > 10) {{ clamp(x, 0, 10); }}
+        return self;
+    }}
+}}
+
+impl Point{n} for Printable {{
+    toString() -> string {{
+        return format("({{}}, {{}})", x, y);
+    }}
+}}
+
+Point{n}(1, 2) as origin{n};
+'''
+
+
+def generate_source(size: int) -> str:
+    """Generate a Shard program of at least `size` characters"""
+    parts = []
+    total = 0
+    n = 0
+    while total < size:
+        unit = UNIT.format(n=n)
+        parts.append(unit)
+        total += len(unit)
+        n += 1
+    return ''.join(parts)
+
+
+def main():
+    max_kb = int(sys.argv[1]) if len(sys.argv) > 1 else 1024
+    print(f"{'size':>8} | {'decls':>7} | {'seconds':>8} | {'KB/s':>8}")
+    kb = 128
+    while kb <= max_kb:
+        source = generate_source(kb * 1024)
+        start = time.perf_counter()
+        program = Parser(Lexer(source)).parse()
+        elapsed = time.perf_counter() - start
+        print(f"{kb:>6}KB | {len(program.declarations):>7} | {elapsed:>8.3f} | {kb / elapsed:>8.1f}")
+        kb *= 2
+
+
+if __name__ == '__main__':
+    main()
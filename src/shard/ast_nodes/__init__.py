@@ -1,17 +1,24 @@
-from .base import Node, Expression, Statement, Declaration, SourceLocation
+from .base import Node, NodeVisitor, Expression, Statement, Declaration, SourceLocation, Deferred
 from .expressions import BinaryOp, UnaryOp, Literal, Identifier, FunctionCall, AssignmentExpr, MemberAccess
 from .statements import ExpressionStatement, ReturnStatement, If, While, ComponentInstantiation
 from .declarations import (
     TypeDef, ShardDef, ImplDef, FunctionDef, VariableDef, Program, ObjectDef, Parameter
 )
+from .walk import walk, iter_nodes, iter_child_nodes
+from .arena import ArenaTree, ArenaCursor
+from .hashcons import HashConsFactory
 
 __all__ = [
     # Base classes
-    'Node', 'Expression', 'Statement', 'Declaration', 'SourceLocation',
+    'Node', 'NodeVisitor', 'Expression', 'Statement', 'Declaration', 'SourceLocation', 'Deferred',
     # Expressions
     'BinaryOp', 'UnaryOp', 'Literal', 'Identifier', 'FunctionCall', 'AssignmentExpr', 'MemberAccess',
     # Statements
     'ExpressionStatement', 'ReturnStatement', 'If', 'While', 'ComponentInstantiation',
     # Declarations
-    'TypeDef', 'ShardDef', 'ImplDef', 'FunctionDef', 'VariableDef', 'Program', 'ObjectDef', 'Parameter'
+    'TypeDef', 'ShardDef', 'ImplDef', 'FunctionDef', 'VariableDef', 'Program', 'ObjectDef', 'Parameter',
+    # Traversal
+    'walk', 'iter_nodes', 'iter_child_nodes',
+    # Flat representation
+    'ArenaTree', 'ArenaCursor', 'HashConsFactory'
 ] 
\ No newline at end of file
@@ -0,0 +1,308 @@
+from array import array
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Type, Union, get_args, get_origin, get_type_hints
+
+from .base import Node, SourceLocation
+from .expressions import BinaryOp, UnaryOp, Literal, Identifier, FunctionCall, AssignmentExpr, MemberAccess
+from .statements import ExpressionStatement, ReturnStatement, If, While, ComponentInstantiation
+from .declarations import TypeDef, ShardDef, ImplDef, FunctionDef, VariableDef, Program, Parameter
+
+# Kind of an arena entry, by index. Besides the node classes there are two
+# marker kinds standing for the value of a child field: list (its children
+# are the items) and NoneType (an empty optional field), so every child
+# field holds exactly one entry and the tree converts back unambiguously.
+KINDS: Tuple[type, ...] = (
+    type(None), list,
+    Program, TypeDef, ShardDef, ImplDef, FunctionDef, VariableDef, Parameter,
+    ExpressionStatement, ReturnStatement, If, While, ComponentInstantiation,
+    BinaryOp, UnaryOp, Literal, Identifier, FunctionCall, AssignmentExpr, MemberAccess,
+)
+KIND_BY_CLASS: Dict[type, int] = {cls: kind for kind, cls in enumerate(KINDS)}
+NONE_KIND = KIND_BY_CLASS[type(None)]
+LIST_KIND = KIND_BY_CLASS[list]
+
+# Fields other than children and location, in declaration order; their
+# values make up a node's payload
+PAYLOAD_FIELDS: Dict[type, Tuple[str, ...]] = {
+    cls: tuple(
+        name for name in cls.__dataclass_fields__
+        if name != 'location' and name not in cls.CHILD_FIELDS
+    )
+    for cls in KINDS[2:]
+}
+# Per class, the constructor arguments as positions into the node's
+# children followed by its payload values
+FIELD_ORDER: Dict[type, Tuple[int, ...]] = {
+    cls: tuple(
+        cls.CHILD_FIELDS.index(name) if name in cls.CHILD_FIELDS
+        else len(cls.CHILD_FIELDS) + PAYLOAD_FIELDS[cls].index(name)
+        for name in cls.__dataclass_fields__ if name != 'location'
+    )
+    for cls in KINDS[2:]
+}
+
+
+def _may_hold_list(hint: Any) -> bool:
+    """Whether a field annotated hint may hold a list (List[...], or a Union with one)"""
+    origin = get_origin(hint)
+    if origin is Union:
+        return any(_may_hold_list(arg) for arg in get_args(hint))
+    return origin is list
+
+
+# Per class, the payload positions of fields that may hold a list, which
+# payloads store as a tuple
+LIST_PAYLOADS: Dict[type, Tuple[int, ...]] = {
+    cls: tuple(
+        position for position, name in enumerate(PAYLOAD_FIELDS[cls])
+        if _may_hold_list(get_type_hints(cls)[name])
+    )
+    for cls in KINDS[2:]
+}
+
+NodeKinds = Union[Type[Node], Tuple[Type[Node], ...]]
+
+
+class ArenaTree:
+    """An AST stored as parallel arrays, indexed by integer handles.
+
+    Entry i has a kind (array 'B', an index into KINDS), the handles of
+    its first child and next sibling (array 'i', -1 for none), its source
+    span as start/end offsets (array 'i', -1 without a location) and a
+    payload index (array 'I') into payloads. A payload is the tuple of a
+    node's non-child field values (name, operator, literal value,
+    modifiers...); equal payloads are stored once.
+
+    Entries are in pre-order, so the root is handle 0, a node's children
+    come after it and a pass over every node of some kind is a scan of
+    the kinds array. Children are ordered by CHILD_FIELDS, one entry per
+    field: the node itself, a list marker or a None marker (see KINDS).
+
+    Locations are assumed to share one line table, lines.
+    """
+
+    __slots__ = ('kinds', 'first_child', 'next_sibling', 'starts', 'ends', 'data', 'payloads', 'lines')
+
+    def __init__(self, lines=None):
+        self.kinds = array('B')
+        self.first_child = array('i')
+        self.next_sibling = array('i')
+        self.starts = array('i')
+        self.ends = array('i')
+        self.data = array('I')
+        self.payloads: List[tuple] = [()]
+        self.lines = lines
+
+    @classmethod
+    def from_program(cls, program: Node) -> 'ArenaTree':
+        """Flatten a tree (normally a Program) into a new arena.
+
+        Deferred function bodies are parsed on the way.
+        """
+        arena = cls()
+        kinds, first_child, next_sibling = arena.kinds, arena.first_child, arena.next_sibling
+        starts, ends, data, payloads = arena.starts, arena.ends, arena.data, arena.payloads
+        payload_ids: Dict[tuple, int] = {((), ()): 0}
+        # Last child added to each entry so far, to link the next one
+        last_child: List[int] = []
+
+        stack: List[Tuple[Any, int]] = [(program, -1)]
+        pop, push = stack.pop, stack.append
+        while stack:
+            value, parent = pop()
+            handle = len(kinds)
+            if parent >= 0:
+                previous = last_child[parent]
+                if previous < 0:
+                    first_child[parent] = handle
+                else:
+                    next_sibling[previous] = handle
+                last_child[parent] = handle
+            first_child.append(-1)
+            next_sibling.append(-1)
+            last_child.append(-1)
+
+            node_class = type(value)
+            kinds.append(KIND_BY_CLASS[node_class])
+            if node_class is list:
+                children = value
+                payload = 0
+                location = None
+            elif value is None:
+                children = ()
+                payload = 0
+                location = None
+            else:
+                children = [getattr(value, name) for name in node_class.CHILD_FIELDS]
+                values = tuple(
+                    tuple(field) if type(field) is list else field
+                    for field in [getattr(value, name) for name in PAYLOAD_FIELDS[node_class]]
+                )
+                # The classes keep 1 == True == 1.0 apart in the key
+                key = (values, tuple(map(type, values)))
+                payload = payload_ids.get(key)
+                if payload is None:
+                    payload = payload_ids[key] = len(payloads)
+                    payloads.append(values)
+                location = value.location
+
+            data.append(payload)
+            if location is None:
+                starts.append(-1)
+                ends.append(-1)
+            else:
+                starts.append(location.start)
+                ends.append(location.end)
+                if arena.lines is None:
+                    arena.lines = location.lines
+            for child in reversed(children):
+                push((child, handle))
+        return arena
+
+    def to_program(self, handle: int = 0) -> Any:
+        """Build the object tree rooted at handle (the whole tree by default)"""
+        kinds, next_sibling, first_child = self.kinds, self.next_sibling, self.first_child
+        starts, ends, data, payloads, lines = self.starts, self.ends, self.data, self.payloads, self.lines
+        end = self._subtree_end(handle)
+        # Values built so far, by handle - handle; pre-order means children
+        # have larger handles than their parent, so they are built first
+        built: List[Any] = [None] * (end - handle)
+        for index in range(end - 1, handle - 1, -1):
+            kind = kinds[index]
+            if kind == NONE_KIND:
+                continue
+            children = []
+            child = first_child[index]
+            while child >= 0:
+                children.append(built[child - handle])
+                child = next_sibling[child]
+            if kind == LIST_KIND:
+                built[index - handle] = children
+                continue
+            node_class = KINDS[kind]
+            values = children + list(payloads[data[index]])
+            offset = len(children)
+            for position in LIST_PAYLOADS[node_class]:
+                if type(values[offset + position]) is tuple:
+                    values[offset + position] = list(values[offset + position])
+            node = node_class(*[values[position] for position in FIELD_ORDER[node_class]])
+            if starts[index] >= 0:
+                node.location = SourceLocation(starts[index], ends[index], lines)
+            built[index - handle] = node
+        return built[0]
+
+    def _subtree_end(self, handle: int) -> int:
+        """Handle just past the last descendant of handle"""
+        first_child, next_sibling = self.first_child, self.next_sibling
+        while True:
+            if next_sibling[handle] >= 0:
+                return next_sibling[handle]
+            child = first_child[handle]
+            if child < 0:
+                return handle + 1
+            # No later sibling: the subtree ends with its last child's
+            while next_sibling[child] >= 0:
+                child = next_sibling[child]
+            handle = child
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def kind(self, handle: int) -> type:
+        """Node class of an entry (list or NoneType for the markers)"""
+        return KINDS[self.kinds[handle]]
+
+    def children(self, handle: int) -> Iterator[int]:
+        """Yield the handles of the children of handle, in order"""
+        next_sibling = self.next_sibling
+        child = self.first_child[handle]
+        while child >= 0:
+            yield child
+            child = next_sibling[child]
+
+    def field(self, handle: int, name: str) -> Any:
+        """Value of a node's field: a handle for child fields, else the payload value"""
+        node_class = KINDS[self.kinds[handle]]
+        if name in node_class.CHILD_FIELDS:
+            position = node_class.CHILD_FIELDS.index(name)
+            for child in self.children(handle):
+                if not position:
+                    return child
+                position -= 1
+        return self.payloads[self.data[handle]][PAYLOAD_FIELDS[node_class].index(name)]
+
+    def location(self, handle: int) -> Optional[SourceLocation]:
+        if self.starts[handle] < 0:
+            return None
+        return SourceLocation(self.starts[handle], self.ends[handle], self.lines)
+
+    def iter_nodes(self, types: Optional[NodeKinds] = None) -> Iterator[int]:
+        """Yield the handles of all nodes (not markers) in pre-order.
+
+        With types, only nodes of those classes (or subclasses) are yielded.
+        """
+        if types is None:
+            types = Node
+        wanted = bytes(i for i, cls in enumerate(KINDS) if issubclass(cls, types))
+        kinds = self.kinds
+        for handle in range(len(kinds)):
+            if kinds[handle] in wanted:
+                yield handle
+
+    def cursor(self, handle: int = 0) -> 'ArenaCursor':
+        return ArenaCursor(self, handle)
+
+
+class ArenaCursor:
+    """Moves over an ArenaTree without building node objects.
+
+    The current entry is handle; the goto_* methods move and return True,
+    or stay put and return False when there is nowhere to go. Markers are
+    entries like any other, with kind list or NoneType.
+    """
+
+    __slots__ = ('arena', 'handle', 'parents')
+
+    def __init__(self, arena: ArenaTree, handle: int = 0):
+        self.arena = arena
+        self.handle = handle
+        self.parents: List[int] = []
+
+    @property
+    def kind(self) -> type:
+        return KINDS[self.arena.kinds[self.handle]]
+
+    @property
+    def start(self) -> int:
+        return self.arena.starts[self.handle]
+
+    @property
+    def end(self) -> int:
+        return self.arena.ends[self.handle]
+
+    @property
+    def depth(self) -> int:
+        return len(self.parents)
+
+    def field(self, name: str) -> Any:
+        return self.arena.field(self.handle, name)
+
+    def goto_first_child(self) -> bool:
+        child = self.arena.first_child[self.handle]
+        if child < 0:
+            return False
+        self.parents.append(self.handle)
+        self.handle = child
+        return True
+
+    def goto_next_sibling(self) -> bool:
+        sibling = self.arena.next_sibling[self.handle]
+        if sibling < 0:
+            return False
+        self.handle = sibling
+        return True
+
+    def goto_parent(self) -> bool:
+        if not self.parents:
+            return False
+        self.handle = self.parents.pop()
+        return True
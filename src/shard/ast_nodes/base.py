@@ -1,49 +1,217 @@
-from dataclasses import dataclass
-from typing import Optional, Any
-from abc import ABC, abstractmethod
+import sys
+from dataclasses import dataclass, field
+from typing import Optional, Any, Callable, Dict, Tuple
+from abc import ABCMeta
+from ..lexer.line_table import LineTable
 
-@dataclass
+# Nodes are slotted dataclasses where the interpreter supports it (3.10+):
+# no per-instance __dict__, so large trees take far less memory and field
+# access skips the dict lookup. Older interpreters get plain dataclasses.
+if sys.version_info >= (3, 10):
+    node_dataclass = dataclass(slots=True)
+else:
+    node_dataclass = dataclass
+
+class Deferred:
+    """Stand-in for a field value that is only computed when first read"""
+    __slots__ = ('compute',)
+
+    def __init__(self, compute: Callable[[], Any]):
+        self.compute = compute
+
+class LazyField:
+    """Descriptor for a node field that may hold a Deferred.
+
+    It wraps the field's storage (the slot, or the instance dict without
+    slots). Reading the field replaces a Deferred by its computed value, so
+    equality, repr and the encoders only ever see ordinary values.
+    """
+    __slots__ = ('name', 'slot')
+
+    def __init__(self, name: str, slot: Any):
+        self.name = name
+        self.slot = slot
+
+    def _load(self, node: 'Node') -> Any:
+        if self.slot is not None:
+            return self.slot.__get__(node)
+        return vars(node)[self.name]
+
+    def __get__(self, node: Optional['Node'], owner: type = None) -> Any:
+        if node is None:
+            return self
+        value = self._load(node)
+        if type(value) is Deferred:
+            value = value.compute()
+            self.__set__(node, value)
+        return value
+
+    def __set__(self, node: 'Node', value: Any):
+        if self.slot is not None:
+            self.slot.__set__(node, value)
+        else:
+            vars(node)[self.name] = value
+
+    def is_deferred(self, node: 'Node') -> bool:
+        """Whether the field of node has not been computed yet"""
+        return type(self._load(node)) is Deferred
+
+def lazy_fields(*names: str) -> Callable[[type], type]:
+    """Class decorator (outside node_dataclass) making the named fields lazy"""
+    def decorate(cls: type) -> type:
+        for name in names:
+            setattr(cls, name, LazyField(name, cls.__dict__.get(name)))
+        return cls
+    return decorate
+
+@node_dataclass
 class SourceLocation:
-    """Source code location information"""
-    line: int
-    column: int
-    length: int
-    file: str
-
-class NodeVisitor(ABC):
-    """Abstract base class for AST visitors"""
-    
-    @abstractmethod
+    """Source span as start/end offsets into the text of lines.
+
+    Line and column are looked up in the file's line table when read, so
+    building a location costs one small object and no position arithmetic.
+    """
+    start: int
+    end: int
+    lines: Optional[LineTable] = field(default=None, compare=False)
+
+    @property
+    def line(self) -> int:
+        return self.lines.line_column(self.start)[0]
+
+    @property
+    def column(self) -> int:
+        return self.lines.line_column(self.start)[1]
+
+    @property
+    def length(self) -> int:
+        return self.end - self.start
+
+    @property
+    def file(self) -> str:
+        return self.lines.file if self.lines is not None else '<unknown>'
+
+    def __reduce__(self):
+        return SourceLocation, (self.start, self.end, self.lines)
+
+    def __repr__(self) -> str:
+        if self.lines is None:
+            return f"SourceLocation(start={self.start}, end={self.end})"
+        return (
+            f"SourceLocation(line={self.line}, column={self.column}, length={self.length}, "
+            f"file={self.file!r}, start={self.start}, end={self.end})"
+        )
+
+def _visit_method(visitor_class: type, node_class: type) -> Callable:
+    """Look up and cache visit_<NodeClass>, falling back to generic_visit"""
+    method = getattr(visitor_class, f'visit_{node_class.__name__}', None)
+    if method is None:
+        method = visitor_class.generic_visit
+    visitor_class._visit_methods[node_class] = method
+    return method
+
+class _VisitorMeta(ABCMeta):
+    """Metaclass of NodeVisitor: keeps the dispatch caches of its classes valid.
+
+    Setting or deleting a visit_* method (or generic_visit) on a visitor
+    class clears the caches of that class and all its subclasses.
+    """
+
+    def __setattr__(cls, name: str, value: Any):
+        super().__setattr__(name, value)
+        if name.startswith('visit_') or name == 'generic_visit':
+            cls._clear_visit_methods()
+
+    def __delattr__(cls, name: str):
+        super().__delattr__(name)
+        if name.startswith('visit_') or name == 'generic_visit':
+            cls._clear_visit_methods()
+
+    def _clear_visit_methods(cls):
+        classes = [cls]
+        while classes:
+            visitor_class = classes.pop()
+            visitor_class._visit_methods.clear()
+            classes.extend(visitor_class.__subclasses__())
+
+class NodeVisitor(metaclass=_VisitorMeta):
+    """Base class for AST visitors.
+
+    visit() calls visit_<NodeClass>(node) if the visitor class defines it
+    and generic_visit(node) otherwise. The method is looked up once per
+    node class and cached on the visitor class itself (_visit_methods), so
+    dispatch costs one dict lookup and the cache goes away with the class.
+    Methods are resolved on the class, not the instance.
+    """
+
+    # Node class -> unbound method; every subclass gets its own
+    _visit_methods: Dict[type, Callable] = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._visit_methods = {}
+
     def visit(self, node: 'Node') -> Any:
         """Visit a node"""
-        pass
+        method = type(self)._visit_methods.get(type(node))
+        if method is None:
+            method = _visit_method(type(self), type(node))
+        return method(self, node)
 
     def generic_visit(self, node: 'Node') -> Any:
-        """Called if no explicit visitor function exists for a node"""
-        pass
+        """Called if no explicit visitor function exists for a node.
+
+        Visits the node's children in CHILD_FIELDS order: nodes held
+        directly and nodes in list fields.
+        """
+        visit = self.visit
+        for name in node.CHILD_FIELDS:
+            value = getattr(node, name)
+            if type(value) is list:
+                for item in value:
+                    visit(item)
+            elif value is not None:
+                visit(value)
 
 class Node:
-    """Base class for all AST nodes"""
+    """Base class for all AST nodes.
+
+    CHILD_FIELDS names the fields that hold child nodes (a node, a list of
+    nodes, or None), in source order; every node class declares its own.
+    The walkers and generic_visit read it instead of reflecting over fields.
+    """
+    __slots__ = ()
+    CHILD_FIELDS: Tuple[str, ...] = ()
     location: Optional[SourceLocation] = None
 
+    def __reduce__(self):
+        # Pickle as a constructor call on the field values, which is about
+        # twice as fast as the generic slots state (see parse_parallel)
+        return type(self), tuple([getattr(self, name) for name in self.__dataclass_fields__])
+
     def accept(self, visitor: NodeVisitor) -> Any:
-        """Accept a visitor"""
-        method = f'visit_{self.__class__.__name__}'
-        if hasattr(visitor, method):
-            return getattr(visitor, method)(self)
-        return visitor.generic_visit(self)
+        """Accept a visitor: call its visit_<NodeClass> or generic_visit"""
+        methods = getattr(type(visitor), '_visit_methods', None)
+        if methods is None:
+            # Not a NodeVisitor: no cache to keep valid, look it up each time
+            method = getattr(visitor, f'visit_{type(self).__name__}', None)
+            return method(self) if method is not None else visitor.generic_visit(self)
+        method = methods.get(type(self))
+        if method is None:
+            method = _visit_method(type(visitor), type(self))
+        return method(visitor, self)
 
-@dataclass
+@node_dataclass
 class Expression(Node):
     """Base class for all expression nodes"""
     pass
 
-@dataclass
+@node_dataclass
 class Statement(Node):
     """Base class for all statement nodes"""
     pass
 
-@dataclass
+@node_dataclass
 class Declaration(Node):
     """Base class for all declaration nodes"""
     pass 
\ No newline at end of file
@@ -1,29 +1,32 @@
-from dataclasses import dataclass
 from typing import List, Optional, Union
-from .base import Declaration, Statement, Expression, SourceLocation
+from .base import Declaration, Statement, Expression, SourceLocation, node_dataclass, lazy_fields
 from ..lexer.tokens import TokenTypes
 
-@dataclass
+@node_dataclass
 class Parameter(Declaration):
     """Parameter in a function definition"""
+    CHILD_FIELDS = ('default_value',)
     modifiers: List[TokenTypes]
     name: str
     param_type: Optional[str]
     default_value: Optional[Expression]
     location: Optional[SourceLocation] = None
 
-@dataclass
+@node_dataclass
 class VariableDef(Declaration):
     """Variable definition node"""
+    CHILD_FIELDS = ('value',)
     modifiers: List[TokenTypes]
     name: str
     type_name: Optional[str]
     value: Optional[Expression]
     location: Optional[SourceLocation] = None
 
-@dataclass
+@lazy_fields('body')
+@node_dataclass
 class FunctionDef(Declaration):
-    """Function definition node"""
+    """Function definition node; body may be parsed on first access (skeleton mode)"""
+    CHILD_FIELDS = ('params', 'body')
     modifiers: List[TokenTypes]
     name: str
     params: List['Parameter']
@@ -31,35 +34,38 @@ class FunctionDef(Declaration):
     body: Optional[List[Statement]]
     location: Optional[SourceLocation] = None
 
-@dataclass
+@node_dataclass
 class ObjectDef(Declaration):
     """Base class for type and shard definitions"""
+    CHILD_FIELDS = ('members',)
     modifiers: List[TokenTypes]
     name: str
     parents: Optional[Union[str, List[str]]]
     members: Optional[List[Union[FunctionDef, VariableDef]]]
     location: Optional[SourceLocation] = None
 
-@dataclass
+@node_dataclass
 class TypeDef(ObjectDef):
     """Type definition node"""
     pass
 
-@dataclass
+@node_dataclass
 class ShardDef(ObjectDef):
     """Shard definition node"""
     pass
 
-@dataclass
+@node_dataclass
 class ImplDef(Declaration):
     """Implementation block node"""
+    CHILD_FIELDS = ('members',)
     modifiers: List[TokenTypes]
     target_type: str
     for_type: Optional[str]
     members: List[Union[FunctionDef, VariableDef]]
     location: Optional[SourceLocation] = None
 
-@dataclass
+@node_dataclass
 class Program(Declaration):
     """Root program node"""
+    CHILD_FIELDS = ('declarations',)
     declarations: List[Union[ObjectDef, ImplDef]] 
\ No newline at end of file
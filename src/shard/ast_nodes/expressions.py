@@ -1,53 +1,57 @@
-from dataclasses import dataclass
 from typing import Any, List, Union, Optional
-from .base import Expression, SourceLocation
+from .base import Expression, SourceLocation, node_dataclass
 from ..lexer.tokens import TokenTypes
 
-@dataclass
+@node_dataclass
 class BinaryOp(Expression):
     """Binary operation node"""
+    CHILD_FIELDS = ('left', 'right')
     left: Expression
     operator: TokenTypes
     right: Expression
     location: Optional[SourceLocation] = None
 
-@dataclass
+@node_dataclass
 class UnaryOp(Expression):
     """Unary operation node"""
+    CHILD_FIELDS = ('operand',)
     operator: TokenTypes
     operand: Expression
     location: Optional[SourceLocation] = None
 
-@dataclass
+@node_dataclass
 class Literal(Expression):
     """Literal value node"""
     value: Union[str, int, float, bool]
     literal_type: TokenTypes  # STRING, INTEGER, FLOAT, BOOL
     location: Optional[SourceLocation] = None
 
-@dataclass 
+@node_dataclass
 class Identifier(Expression):
     """Identifier reference node"""
     name: str
     location: Optional[SourceLocation] = None
 
-@dataclass
+@node_dataclass
 class MemberAccess(Expression):
     """Member access expression (e.g., obj.field)"""
+    CHILD_FIELDS = ('object', 'member')
     object: Expression
     member: Identifier
     location: Optional[SourceLocation] = None
 
-@dataclass
+@node_dataclass
 class FunctionCall(Expression):
     """Function call node"""
+    CHILD_FIELDS = ('function', 'arguments')
     function: Expression
     arguments: List[Expression]
     location: Optional[SourceLocation] = None
 
-@dataclass
+@node_dataclass
 class AssignmentExpr(Expression):
     """Assignment expression node"""
+    CHILD_FIELDS = ('target', 'value')
     target: Union[Identifier, 'MemberAccess']
     operator: TokenTypes  # ASSIGN or compound assignments like PLUS_ASSIGN
     value: Expression
@@ -0,0 +1,100 @@
+from array import array
+from typing import Any, Dict, List, Optional
+
+from .base import Node, SourceLocation
+
+
+class HashConsFactory:
+    """Builds nodes so that structurally equal subtrees are one object.
+
+    make(cls, location, *fields) returns the existing node for a class and
+    field values seen before, and a new one otherwise. Children come from
+    the same factory, so a node is identified by its class, its plain
+    values and the identities of its children: looking it up costs one
+    dict probe, however large the subtree, and two subtrees built by one
+    factory are equal exactly when they are the same object.
+
+    Shared nodes have no location of their own (location is None). Every
+    location a node was built at is recorded in a side table instead, in
+    build order, as start/end offsets plus the index of its line table in
+    tables (one array 'I' per node), so a factory reused across files
+    resolves every location against its own file; location_of returns the
+    latest, which while parsing is the occurrence just built. Each distinct
+    node also gets a structural hash, computed from its class, values and
+    children's hashes.
+
+    Shared nodes (and their list fields) must not be mutated.
+    """
+
+    __slots__ = ('nodes', 'hashes', 'locations', 'tables', 'table_ids')
+
+    def __init__(self):
+        # Intern key -> node
+        self.nodes: Dict[tuple, Node] = {}
+        # id(node) -> structural hash
+        self.hashes: Dict[int, int] = {}
+        # id(node) -> (table index, start, end) of every location it was built at
+        self.locations: Dict[int, array] = {}
+        # Line tables of the locations, and id(table) -> index in tables
+        self.tables: List[Any] = []
+        self.table_ids: Dict[int, int] = {}
+
+    def make(self, cls: type, location: Optional[SourceLocation], *fields: Any) -> Node:
+        """Return the shared node cls(*fields), recording location for it.
+
+        fields are the node's field values in declaration order, without
+        location; node fields and list items must come from this factory.
+        """
+        hashes = self.hashes
+        key = [cls]
+        shape = [cls.__name__]
+        for value in fields:
+            if isinstance(value, Node):
+                key.append(id(value))
+                shape.append(hashes[id(value)])
+            elif type(value) is list:
+                key.append(tuple([id(item) for item in value]))
+                shape.append(tuple([hashes[id(item)] for item in value]))
+            else:
+                # The type keeps 1, 1.0 and True apart
+                key.append((type(value), value))
+                shape.append(value)
+        key = tuple(key)
+        node = self.nodes.get(key)
+        if node is None:
+            node = self.nodes[key] = cls(*fields)
+            hashes[id(node)] = hash(tuple(shape))
+            self.locations[id(node)] = array('I')
+        if location is not None:
+            table = self.table_ids.get(id(location.lines))
+            if table is None:
+                table = self.table_ids[id(location.lines)] = len(self.tables)
+                self.tables.append(location.lines)
+            offsets = self.locations[id(node)]
+            offsets.append(table)
+            offsets.append(location.start)
+            offsets.append(location.end)
+        return node
+
+    def structural_hash(self, node: Node) -> int:
+        return self.hashes[id(node)]
+
+    def location_of(self, node: Node) -> Optional[SourceLocation]:
+        """Latest location node was built at"""
+        offsets = self.locations[id(node)]
+        if not offsets:
+            return None
+        return SourceLocation(offsets[-2], offsets[-1], self.tables[offsets[-3]])
+
+    def locations_of(self, node: Node) -> List[SourceLocation]:
+        """All locations node was built at, in build order"""
+        offsets = self.locations[id(node)]
+        tables = self.tables
+        return [
+            SourceLocation(offsets[i + 1], offsets[i + 2], tables[offsets[i]])
+            for i in range(0, len(offsets), 3)
+        ]
+
+    def __len__(self) -> int:
+        """Number of distinct nodes"""
+        return len(self.nodes)
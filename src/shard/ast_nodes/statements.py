@@ -1,37 +1,41 @@
-from dataclasses import dataclass
 from typing import List, Optional
-from .base import Statement, Expression, SourceLocation
+from .base import Statement, Expression, SourceLocation, node_dataclass
 
-@dataclass
+@node_dataclass
 class ExpressionStatement(Statement):
     """Expression statement node"""
+    CHILD_FIELDS = ('expr',)
     expr: Expression
     location: Optional[SourceLocation] = None
 
-@dataclass
+@node_dataclass
 class ReturnStatement(Statement):
     """Return statement node"""
+    CHILD_FIELDS = ('value',)
     value: Optional[Expression] = None
     location: Optional[SourceLocation] = None
 
-@dataclass
+@node_dataclass
 class If(Statement):
     """If statement node"""
+    CHILD_FIELDS = ('condition', 'then_block', 'else_block')
     condition: Expression
     then_block: List[Statement]
     else_block: Optional[List[Statement]] = None
     location: Optional[SourceLocation] = None
 
-@dataclass
+@node_dataclass
 class While(Statement):
     """While statement node"""
+    CHILD_FIELDS = ('condition', 'body')
     condition: Expression
     body: List[Statement]
     location: Optional[SourceLocation] = None
 
-@dataclass
+@node_dataclass
 class ComponentInstantiation(Statement):
     """Component instantiation statement node"""
+    CHILD_FIELDS = ('args',)
     component_type: str
     instance_name: str
     args: List[Expression]
@@ -0,0 +1,67 @@
+from typing import Callable, Iterator, Optional, Tuple, Type, Union
+
+from .base import Node
+
+NodeTypes = Union[Type[Node], Tuple[Type[Node], ...]]
+
+
+def iter_child_nodes(node: Node) -> Iterator[Node]:
+    """Yield the direct children of node in source order"""
+    for name in node.CHILD_FIELDS:
+        value = getattr(node, name)
+        if type(value) is list:
+            yield from value
+        elif value is not None:
+            yield value
+
+
+def iter_nodes(node: Node, types: Optional[NodeTypes] = None) -> Iterator[Node]:
+    """Yield node and all its descendants in pre-order (source order).
+
+    With types (a class or tuple of classes), only instances of them are
+    yielded; the whole tree is still searched. The walk uses an explicit
+    stack, so tree depth is not limited by the recursion limit.
+    """
+    stack = [node]
+    pop, append, extend = stack.pop, stack.append, stack.extend
+    while stack:
+        node = pop()
+        if types is None or isinstance(node, types):
+            yield node
+        fields = node.CHILD_FIELDS
+        # Children are pushed last to first so they pop in source order
+        for index in range(len(fields) - 1, -1, -1):
+            value = getattr(node, fields[index])
+            if type(value) is list:
+                extend(reversed(value))
+            elif value is not None:
+                append(value)
+
+
+def walk(node: Node, pre: Optional[Callable[[Node], Optional[bool]]] = None,
+         post: Optional[Callable[[Node], None]] = None) -> None:
+    """Traverse node and its descendants depth-first, iteratively.
+
+    pre(node) is called before a node's children are visited and
+    post(node) after all of them. If pre returns False the node's
+    children are skipped, and so is its post call.
+    """
+    # An entry is a node before its children, or (node,) once they are done
+    stack = [node]
+    pop, append = stack.pop, stack.append
+    while stack:
+        node = pop()
+        if type(node) is tuple:
+            post(node[0])
+            continue
+        if pre is not None and pre(node) is False:
+            continue
+        if post is not None:
+            append((node,))
+        fields = node.CHILD_FIELDS
+        for index in range(len(fields) - 1, -1, -1):
+            value = getattr(node, fields[index])
+            if type(value) is list:
+                stack.extend(reversed(value))
+            elif value is not None:
+                append(value)
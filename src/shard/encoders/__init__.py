@@ -3,4 +3,5 @@ Encoders for various compiler outputs.
 """ 
 
 from .json_encoder import encode_ast_as_json
-from .alt_encoder import encode_ast_as_alt
\ No newline at end of file
+from .alt_encoder import encode_ast_as_alt
+from .binary_encoder import encode_ast_as_binary, decode_ast_from_binary
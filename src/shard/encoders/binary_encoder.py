@@ -0,0 +1,260 @@
+import struct
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..ast_nodes import (
+    Node, Program, ImplDef, TypeDef, ShardDef, FunctionDef, VariableDef, Parameter,
+    ComponentInstantiation, Literal, Identifier, FunctionCall, BinaryOp, AssignmentExpr,
+    MemberAccess, ExpressionStatement, ReturnStatement, If, While, UnaryOp, SourceLocation
+)
+from ..lexer.line_table import LineTable
+from ..lexer.tokens import TokenTypes
+
+# Binary AST format
+#
+#   header    MAGIC, FORMAT_VERSION (one byte), flags (varint)
+#   strings   count, then per string its UTF-8 length and bytes
+#   tree      one value: the root node
+#
+# A value starts with a varint tag. Scalars: NONE, FALSE, TRUE, INT
+# (zigzag varint), FLOAT (8 bytes, little endian), STR (index into the
+# string table), TOKEN (TokenTypes value) and LIST (count, then the items).
+# A tag of NODE_TAG + i is a node of class NODE_CLASSES[i], followed by its
+# field values in declaration order, without location. With FLAG_LOCATIONS
+# every node then ends with its location: 0 for none, else 1 + the zigzag
+# difference between its start and the previous location's start, then its
+# length. Nodes end in post-order, so the differences are mostly small.
+#
+# Changing NODE_CLASSES, a class's fields or the encoding of a value
+# changes the format and needs a new FORMAT_VERSION.
+MAGIC = b'SHAST'
+FORMAT_VERSION = 1
+FLAG_LOCATIONS = 1
+
+NONE, FALSE, TRUE, INT, FLOAT, STR, TOKEN, LIST = range(8)
+NODE_TAG = 16
+NODE_CLASSES: Tuple[type, ...] = (
+    Program, TypeDef, ShardDef, ImplDef, FunctionDef, VariableDef, Parameter,
+    ExpressionStatement, ReturnStatement, If, While, ComponentInstantiation,
+    BinaryOp, UnaryOp, Literal, Identifier, FunctionCall, AssignmentExpr, MemberAccess,
+)
+NODE_TAGS: Dict[type, int] = {cls: NODE_TAG + index for index, cls in enumerate(NODE_CLASSES)}
+# Field names per class, without location
+NODE_FIELDS: Dict[type, Tuple[str, ...]] = {
+    cls: tuple(name for name in cls.__dataclass_fields__ if name != 'location')
+    for cls in NODE_CLASSES
+}
+FIELD_COUNTS: Tuple[int, ...] = tuple(len(NODE_FIELDS[cls]) for cls in NODE_CLASSES)
+
+# TokenTypes by value
+TOKEN_TYPES: Dict[int, TokenTypes] = {kind.value: kind for kind in TokenTypes}
+
+DOUBLE = struct.Struct('<d')
+
+
+def _write_varint(out: bytearray, value: int):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    """Decode the varint at pos; returns (value, position after it)"""
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def encode_ast_as_binary(ast: Node, locations: bool = True) -> bytes:
+    """Encode an AST in the binary format (see decode_ast_from_binary).
+
+    Deferred function bodies are parsed first. Locations keep only their
+    offsets; the line table is supplied again when loading.
+    """
+    body = bytearray()
+    strings: Dict[str, int] = {}
+    append = body.append
+
+    # Values to write, last first; a 1-tuple holds a location that ends
+    # the node written before it
+    stack: List[Any] = [ast]
+    pop, push = stack.pop, stack.append
+    previous_start = 0
+    while stack:
+        value = pop()
+        kind = type(value)
+        tag = NODE_TAGS.get(kind)
+        if tag is not None:
+            append(tag)
+            if locations:
+                push((value.location,))
+            for name in reversed(NODE_FIELDS[kind]):
+                push(getattr(value, name))
+        elif kind is tuple:
+            location = value[0]
+            if location is None:
+                append(0)
+            else:
+                delta = location.start - previous_start
+                previous_start = location.start
+                _write_varint(body, (delta << 1 if delta >= 0 else (-delta << 1) - 1) + 1)
+                _write_varint(body, location.end - location.start)
+        elif value is None:
+            append(NONE)
+        elif kind is bool:
+            append(TRUE if value else FALSE)
+        elif kind is int:
+            append(INT)
+            _write_varint(body, value << 1 if value >= 0 else (-value << 1) - 1)
+        elif kind is float:
+            append(FLOAT)
+            body += DOUBLE.pack(value)
+        elif kind is str:
+            index = strings.get(value)
+            if index is None:
+                index = strings[value] = len(strings)
+            append(STR)
+            _write_varint(body, index)
+        elif kind is TokenTypes:
+            append(TOKEN)
+            _write_varint(body, value.value)
+        elif kind is list:
+            append(LIST)
+            _write_varint(body, len(value))
+            stack.extend(reversed(value))
+        else:
+            raise TypeError(f"Cannot encode {kind.__name__} in a binary AST")
+
+    out = bytearray(MAGIC)
+    out.append(FORMAT_VERSION)
+    _write_varint(out, FLAG_LOCATIONS if locations else 0)
+    _write_varint(out, len(strings))
+    for string in strings:
+        encoded = string.encode('utf-8')
+        _write_varint(out, len(encoded))
+        out += encoded
+    out += body
+    return bytes(out)
+
+
+def decode_ast_from_binary(data: bytes, lines: Optional[LineTable] = None) -> Node:
+    """Rebuild an AST written by encode_ast_as_binary.
+
+    Locations (if the data has them) get lines as their line table; pass
+    the table of the source text for line and column numbers. Raises
+    ValueError for data that is not a binary AST of this format version.
+
+    Building a large tree triggers cyclic collection passes over everything
+    allocated so far, a good part of the load time. The tree has no
+    reference cycles, so a caller loading big ASTs from a single thread may
+    pause the collector around the call (gc.disable()/gc.enable()); this
+    function leaves the process-wide collector alone.
+    """
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError("Not a binary Shard AST")
+    pos = len(MAGIC)
+    if data[pos] != FORMAT_VERSION:
+        raise ValueError(f"Unsupported binary AST format version {data[pos]} (expected {FORMAT_VERSION})")
+    flags, pos = _read_varint(data, pos + 1)
+    with_locations = bool(flags & FLAG_LOCATIONS)
+
+    count, pos = _read_varint(data, pos)
+    strings: List[str] = []
+    for _ in range(count):
+        length, pos = _read_varint(data, pos)
+        strings.append(str(data[pos:pos + length], 'utf-8'))
+        pos += length
+
+    try:
+        return _decode_tree(data, pos, strings, with_locations, lines)
+    except (IndexError, KeyError, struct.error) as error:
+        raise ValueError(f"Truncated or corrupt binary AST: {error}") from None
+
+
+def _decode_tree(data: bytes, pos: int, strings: List[str], with_locations: bool,
+                 lines: Optional[LineTable]) -> Node:
+    """Decode the root value at pos"""
+    classes = NODE_CLASSES
+    field_counts = FIELD_COUNTS
+    token_types = TOKEN_TYPES
+    unpack_double = DOUBLE.unpack_from
+    # Open nodes and lists: [class or list, values so far, values still to read]
+    stack: List[list] = []
+    previous_start = 0
+    while True:
+        tag = data[pos]
+        pos += 1
+        if tag >= NODE_TAG:
+            stack.append([classes[tag - NODE_TAG], [], field_counts[tag - NODE_TAG]])
+            continue
+        if tag == STR:
+            index = data[pos]
+            pos += 1
+            if index >= 0x80:
+                index, pos = _read_varint(data, pos - 1)
+            value = strings[index]
+        elif tag == TOKEN:
+            kind = data[pos]
+            pos += 1
+            if kind >= 0x80:
+                kind, pos = _read_varint(data, pos - 1)
+            value = token_types[kind]
+        elif tag == NONE:
+            value = None
+        elif tag == LIST:
+            count = data[pos]
+            pos += 1
+            if count >= 0x80:
+                count, pos = _read_varint(data, pos - 1)
+            if count:
+                stack.append([list, [], count])
+                continue
+            value = []
+        elif tag == INT:
+            value, pos = _read_varint(data, pos)
+            value = value >> 1 if not value & 1 else -((value + 1) >> 1)
+        elif tag == TRUE:
+            value = True
+        elif tag == FALSE:
+            value = False
+        elif tag == FLOAT:
+            value = unpack_double(data, pos)[0]
+            pos += 8
+        else:
+            raise ValueError(f"Invalid tag {tag} at offset {pos - 1}")
+
+        # Hand the value to the innermost open node or list, closing every
+        # one that it completes
+        while stack:
+            frame = stack[-1]
+            frame[1].append(value)
+            frame[2] -= 1
+            if frame[2]:
+                break
+            stack.pop()
+            cls = frame[0]
+            if cls is list:
+                value = frame[1]
+                continue
+            value = cls(*frame[1])
+            if with_locations:
+                delta = data[pos]
+                pos += 1
+                if delta >= 0x80:
+                    delta, pos = _read_varint(data, pos - 1)
+                if delta:
+                    delta -= 1
+                    previous_start += delta >> 1 if not delta & 1 else -((delta + 1) >> 1)
+                    length = data[pos]
+                    pos += 1
+                    if length >= 0x80:
+                        length, pos = _read_varint(data, pos - 1)
+                    value.location = SourceLocation(previous_start, previous_start + length, lines)
+        else:
+            return value
@@ -16,7 +16,8 @@ class ASTJsonEncoder(json.JSONEncoder):
             result = {
                 "type": obj.__class__.__name__,
             }
-            for k, v in obj.__dict__.items():
+            for k in obj.__dataclass_fields__:
+                v = getattr(obj, k)
                 if v is not None:  # Only include non-None values
                     if k == "modifiers":
                         result[k] = [mod.name for mod in v]
@@ -1,4 +1,9 @@
 from .lexer import Lexer
 from .tokens import TokenTypes, Token
+from .errors import ParseError
+from .line_table import LineTable
+from .symbols import SymbolTable
+from .token_stream import TokenStream
+from .streaming import StreamingLexer
 
-__all__ = ['Lexer', 'TokenTypes', 'Token'] 
\ No newline at end of file
+__all__ = ['Lexer', 'TokenTypes', 'Token', 'ParseError', 'LineTable', 'SymbolTable', 'TokenStream', 'StreamingLexer']
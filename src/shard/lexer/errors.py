@@ -0,0 +1,48 @@
+from typing import Optional
+
+from .tokens import Token
+
+
+class ParseError(SyntaxError):
+    """Syntax error raised by the lexer or the parser at a token.
+
+    Raising one only stores a code, the message and the token with its
+    offset span (an ERROR token for text the lexer rejects); the text
+    shown to users (position, source line and a caret under the span) is
+    rendered when the error is printed. Parsers in debug mode also attach
+    the parser's call stack.
+    """
+
+    def __init__(self, code: str, message: str, token: Token, stack: Optional[str] = None):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.token = token
+        self.start = token.start
+        self.end = token.end
+        self.stack = stack
+
+    def __reduce__(self):
+        return ParseError, (self.code, self.message, self.token, self.stack)
+
+    def render(self) -> str:
+        """Format the error with its position and the offending source line"""
+        lines = self.token.lines
+        if lines is None:
+            text = f"error[{self.code}]: {self.message}"
+        else:
+            line, column = lines.line_column(self.start)
+            text = f"{lines.file}:{line}:{column}: error[{self.code}]: {self.message}"
+            source = lines.line_text(line) if hasattr(lines, 'line_text') else None
+            if source is not None:
+                end_line, end_column = lines.line_column(self.end)
+                width = end_column - column if end_line == line else len(source) - column + 1
+                # Keep tabs so the caret lines up under the token
+                indent = ''.join(char if char == '\t' else ' ' for char in source[:column - 1])
+                text += f"\n    {source}\n    {indent}{'^' * max(width, 1)}"
+        if self.stack is not None:
+            text += "\nParser stack (most recent call last):\n" + self.stack
+        return text
+
+    def __str__(self) -> str:
+        return self.render()
@@ -1,6 +1,12 @@
+import os
+import re
+import mmap
 from enum import Enum, auto
 from dataclasses import dataclass
 from .tokens import TokenTypes, Token
+from .errors import ParseError
+from .line_table import LineTable
+from .symbols import SymbolTable
 
 
 # Constants for token patterns
@@ -64,123 +70,203 @@ SINGLE_CHAR_TOKENS = {
     '.': TokenTypes.DOT,
 }
 
+# Every operator and punctuation token, keyed by its spelling
+OPERATORS = {**COMPOUND_OPERATORS, **SINGLE_CHAR_TOKENS}
+
+# Whitespace and comments between tokens. An unterminated block comment
+# swallows the rest of the input.
+SKIP_PATTERN = r'''
+    (?P<WS>\s+)
+  | (?P<LINE_COMMENT>//[^\n]*)
+  | (?P<BLOCK_COMMENT>/\*[\s\S]*?(?:\*/|\Z))
+'''
+
+# One ordered alternation covering every token class. Operators are sorted
+# longest first so '->' wins over '-' and '==' over '='. Strings that fail to
+# match here (unterminated, bad escape) fall back to _handle_string, which
+# produces the error message.
+TOKEN_PATTERN = r'''
+    (?P<IDENT>[^\W\d]\w*)
+  | (?P<NUMBER>\d+(?P<FRACTION>\.\d*)?)
+  | (?P<STRING>"(?P<BODY>[^"\\\n]*(?:\\[\s\S][^"\\\n]*)*)")
+  | (?P<OPERATOR>%s)
+''' % '|'.join(re.escape(op) for op in sorted(OPERATORS, key=len, reverse=True))
+
+SKIP_RE = re.compile(SKIP_PATTERN, re.VERBOSE)
+TOKEN_RE = re.compile(TOKEN_PATTERN, re.VERBOSE)
+ESCAPE_RE = re.compile(r'\\([\s\S])')
+
+ESCAPE_MAP = {
+    'n': '\n',
+    't': '\t',
+    '"': '"',
+    '\\': '\\',
+    '0': '\0'
+}
+
+# Byte versions of the patterns, for lexing a bytes buffer or mmap in place.
+# Names are matched as runs of ASCII word characters and non-ASCII bytes;
+# a run that is not pure ASCII is decoded and lexed with the str patterns.
+BYTES_SKIP_RE = re.compile(SKIP_PATTERN.encode(), re.VERBOSE)
+BYTES_TOKEN_RE = re.compile(
+    TOKEN_PATTERN.replace(r'[^\W\d]\w*', r'[A-Za-z_\x80-\xff][\w\x80-\xff]*').encode(),
+    re.VERBOSE
+)
+BYTES_OPERATORS = {spelling.encode(): (kind, spelling) for spelling, kind in OPERATORS.items()}
+# Longest text a token touching non-ASCII bytes can span: a name, or a
+# number with Unicode digits, possibly behind Unicode whitespace
+BYTES_DECODE_RE = re.compile(rb'[\w\x80-\xff]+(?:\.[\d\x80-\xff]*)?')
+
+def _unescape(match):
+    char = match.group(1)
+    return ESCAPE_MAP.get(char, char)
+
+def map_file(path):
+    """Map a file read-only; returns bytes for an empty file, which mmap rejects"""
+    with open(path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return b''
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
 class Lexer:
-    def __init__(self, text):
+    """Tokenizer for Shard source.
+
+    The source is either a str or UTF-8 encoded bytes: a bytes-like buffer,
+    an mmap, or an os.PathLike path that is mapped into memory. Bytes are
+    lexed in place without decoding the whole input; token types, values
+    and line/column are the same as for the decoded str, while start/end
+    offsets are byte offsets.
+    """
+
+    def __init__(self, text, filename=None, symbols=None):
+        if isinstance(text, os.PathLike):
+            if filename is None:
+                filename = os.fspath(text)
+            text = map_file(text)
         self.text = text
+        self.filename = filename if filename is not None else '<unknown>'
         self.pos = 0
-        self.line = 1
-        self.column = 1
+        # Offset of text[0] in the whole input; only a StreamingLexer window
+        # starts anywhere but 0
+        self.base = 0
+        self.binary = not isinstance(text, str)
+        self.skip_re = BYTES_SKIP_RE if self.binary else SKIP_RE
+        # ASCII name bytes -> interned str, so bytes mode decodes each name once
+        self.byte_names = {}
+        # Tokens carry offsets only; line/column come from this table
+        self.lines = LineTable(text, self.filename)
+        # Names are interned here; lexers of one compilation can share it
+        self.symbols = symbols if symbols is not None else SymbolTable()
+
+    @property
+    def line(self):
+        return self.lines.line_column(self.base + self.pos)[0]
+
+    @property
+    def column(self):
+        return self.lines.line_column(self.base + self.pos)[1]
 
     def advance(self):
         if self.pos >= len(self.text):
             return None
-        char = self.text[self.pos]
+        char = self.peek()
         self.pos += 1
-        self.column += 1
-        if char == '\n':
-            self.line += 1
-            self.column = 1
         return char
 
     def peek(self, ahead=0):
         """Look ahead at characters without consuming them"""
         pos = self.pos + ahead
-        if pos >= len(self.text):
-            return ''
-        return self.text[pos]
+        char = self.text[pos:pos + 1]
+        # Bytes mode only calls this on the string error path, where the
+        # ASCII quote, backslash and newline bytes are all that matter
+        return char.decode('latin-1') if self.binary else char
+
+    def _error(self, code, message, start, end):
+        """A ParseError for the rejected text between start and end"""
+        value = self.text[start:end]
+        if self.binary:
+            value = bytes(value).decode('utf-8', 'replace')
+        token = Token(TokenTypes.ERROR, value, self.base + start, self.base + end, self.lines)
+        return ParseError(code, message, token)
 
     def skip_whitespace_and_comments(self):
         """Skip whitespace and comments in the input text"""
-        while self.pos < len(self.text):
-            if self.text[self.pos].isspace():
-                if self.text[self.pos] == '\n':
-                    self.line += 1
-                    self.column = 1
-                else:
-                    self.column += 1
-                self.pos += 1
-            elif self.text[self.pos:].startswith('//'):
-                # Skip single-line comment
-                while self.pos < len(self.text) and self.text[self.pos] != '\n':
-                    self.pos += 1
-            elif self.text[self.pos:].startswith('/*'):
-                # Skip multi-line comment
-                self.pos += 2
-                while self.pos < len(self.text) and not self.text[self.pos:].startswith('*/'):
-                    if self.text[self.pos] == '\n':
-                        self.line += 1
-                        self.column = 1
-                    self.pos += 1
-                if self.pos < len(self.text):
-                    self.pos += 2  # Skip the closing */
-            else:
-                break
+        text = self.text
+        skip_re = self.skip_re
+        match = skip_re.match(text, self.pos)
+        while match:
+            self.pos = match.end()
+            match = skip_re.match(text, self.pos)
+
+    def skip_error(self, error):
+        """Go on lexing after the text rejected by a ParseError from scan()"""
+        self.pos = max(self.pos, error.end - self.base)
 
     def get_next_token(self):
+        kind, value, start, end = self.scan()
+        return Token(kind, value, start, end, self.lines)
+
+    def scan(self):
+        """Lex the next token as a (type, value, start, end) tuple.
+
+        This is get_next_token without the Token object, for consumers that
+        store tokens in their own form (see TokenStream).
+        """
+        if self.binary:
+            return self._scan_bytes()
         self.skip_whitespace_and_comments()
-        
-        if self.pos >= len(self.text):
-            return Token(TokenTypes.EOF, None, self.line, self.column)
 
-        # Store current position info for error messages
-        line = self.line
-        column = self.column
-        
-        char = self.peek()
+        start = self.pos
+        if start >= len(self.text):
+            return TokenTypes.EOF, None, start, start
+
+        match = TOKEN_RE.match(self.text, start)
+        if match is None:
+            char = self.text[start]
+            if char == '"':
+                return self._handle_string()
+            raise self._error('invalid-character', f"Invalid character '{char}'", start, start + 1)
 
-        # Check for compound operators
-        for pattern, token_type in COMPOUND_OPERATORS.items():
-            if self.text[self.pos:].startswith(pattern):
-                token = Token(token_type, pattern, line, column)
-                self.pos += len(pattern)
-                self.column += len(pattern)
-                return token
+        kind = match.lastgroup
+        end = match.end()
 
-        # Handle identifiers and keywords
-        if char.isalpha() or char == '_':
-            start = self.pos
-            start_col = self.column
-            while self.peek().isalnum() or self.peek() == '_':
-                self.advance()
-            value = self.text[start:self.pos]
+        if kind == 'OPERATOR':
+            value = match.group()
+            self.pos = end
+            return OPERATORS[value], value, start, end
+
+        if kind == 'IDENT':
+            value = match.group()
+            # \w accepts a few numeric characters (e.g. superscripts) that
+            # str.isalpha() rejects as the first character of a name
+            if not value[0].isalpha() and value[0] != '_':
+                raise self._error('invalid-character', f"Invalid character '{value[0]}'", start, start + 1)
+            self.pos = end
+            symbol_id = self.symbols.ids.get(value)
+            if symbol_id is None:
+                symbol_id = self.symbols.symbol_id(value)
+            value = self.symbols.names[symbol_id]
             token_type = KEYWORDS.get(value, TokenTypes.IDENT)
             # Special handling for boolean literals
             if token_type == TokenTypes.BOOL:
                 value = value == 'true'
-            return Token(token_type, value, line, start_col)
-
-        # Handle numbers
-        if char.isdigit():
-            return self._handle_number()
-
-        # Handle strings
-        if char == '"':
-            return self._handle_string()
+            return token_type, value, start, end
 
-        # Handle single character tokens
-        if char in SINGLE_CHAR_TOKENS:
-            token_type = SINGLE_CHAR_TOKENS[char]
-            self.advance()
-            return Token(token_type, char, line, column)
-
-        raise SyntaxError(f"Invalid character '{char}' at line {line}, column {column}")
+        if kind == 'NUMBER':
+            self.pos = end
+            if match.group('FRACTION') is None:
+                return TokenTypes.INTEGER, int(match.group()), start, end
+            return TokenTypes.FLOAT, float(match.group()), start, end
 
-    def _handle_number(self):
-        start = self.pos
-        start_col = self.column
-        while self.peek().isdigit():
-            self.advance()
-        
-        if self.peek() != '.':
-            return Token(TokenTypes.INTEGER, int(self.text[start:self.pos]), self.line, start_col)
-            
-        self.advance()  # consume dot
-        while self.peek().isdigit():
-            self.advance()
-        return Token(TokenTypes.FLOAT, float(self.text[start:self.pos]), self.line, start_col)
+        # String literal
+        body = match.group('BODY')
+        if '\\' in body:
+            body = ESCAPE_RE.sub(_unescape, body)
+        self.pos = end
+        return TokenTypes.STRING, body, start, end
 
     def _handle_string(self):
-        start_col = self.column
+        start = self.pos
         self.advance()  # consume opening quote
         value = []
         while True:
@@ -188,22 +274,92 @@ class Lexer:
             if char == '"':
                 break
             if char == '\n' or char == '':
-                raise SyntaxError(f"Unterminated string at line {self.line}, column {start_col}")
+                raise self._error('unterminated-string', "Unterminated string", start, self.pos)
             self.advance()
             if char == '\\':
-                escape_map = {
-                    'n': '\n',
-                    't': '\t',
-                    '"': '"',
-                    '\\': '\\',
-                    '0': '\0'
-                }
                 next_char = self.peek()
                 if next_char == '':
-                    raise SyntaxError(f"Unterminated escape sequence at line {self.line}, column {self.column}")
+                    raise self._error('unterminated-escape', "Unterminated escape sequence", self.pos, self.pos)
                 self.advance()
-                value.append(escape_map.get(next_char, next_char))
+                value.append(ESCAPE_MAP.get(next_char, next_char))
             else:
                 value.append(char)
         self.advance()  # consume closing quote
-        return Token(TokenTypes.STRING, ''.join(value), self.line, start_col)
\ No newline at end of file
+        return TokenTypes.STRING, ''.join(value), start, self.pos
+
+    def _scan_bytes(self):
+        """scan() for a bytes buffer"""
+        text = self.text
+        while True:
+            self.skip_whitespace_and_comments()
+            start = self.pos
+            if start >= len(text):
+                return TokenTypes.EOF, None, start, start
+
+            match = BYTES_TOKEN_RE.match(text, start)
+            if match is None:
+                if text[start:start + 1] == b'"':
+                    return self._handle_string()
+                char = text[start:start + 1].decode('latin-1')
+                raise self._error('invalid-character', f"Invalid character '{char}'", start, start + 1)
+
+            kind = match.lastgroup
+            end = match.end()
+
+            if kind == 'OPERATOR':
+                token_type, value = BYTES_OPERATORS[match.group()]
+                self.pos = end
+                return token_type, value, start, end
+
+            if kind == 'IDENT':
+                raw = match.group()
+                value = self.byte_names.get(raw)
+                if value is None:
+                    if not raw.isascii():
+                        token = self._scan_decoded(start)
+                        if token is None:
+                            continue  # skipped Unicode whitespace
+                        return token
+                    value = self.byte_names[raw] = self.symbols.intern(raw.decode('ascii'))
+                self.pos = end
+                token_type = KEYWORDS.get(value, TokenTypes.IDENT)
+                if token_type == TokenTypes.BOOL:
+                    value = value == 'true'
+                return token_type, value, start, end
+
+            if kind == 'NUMBER':
+                if end < len(text) and text[end] >= 0x80:
+                    # May continue with Unicode digits
+                    return self._scan_decoded(start)
+                self.pos = end
+                if match.group('FRACTION') is None:
+                    return TokenTypes.INTEGER, int(match.group()), start, end
+                return TokenTypes.FLOAT, float(match.group()), start, end
+
+            body = match.group('BODY').decode('utf-8')
+            if '\\' in body:
+                body = ESCAPE_RE.sub(_unescape, body)
+            self.pos = end
+            return TokenTypes.STRING, body, start, end
+
+    def _scan_decoded(self, start):
+        """Lex text containing non-ASCII bytes at start with the str patterns.
+
+        Returns the next token, or None if only Unicode whitespace was
+        skipped. Offsets are converted back to byte offsets.
+        """
+        segment = BYTES_DECODE_RE.match(self.text, start).group().decode('utf-8')
+        decoded = Lexer(segment, symbols=self.symbols)
+        decoded.skip_whitespace_and_comments()
+        if decoded.pos:
+            self.pos = start + len(segment[:decoded.pos].encode('utf-8'))
+            return None
+        try:
+            token_type, value, _, token_end = decoded.scan()
+        except SyntaxError:
+            raise self._error(
+                'invalid-character', f"Invalid character '{segment[0]}'",
+                start, start + len(segment[0].encode('utf-8')),
+            ) from None
+        self.pos = start + len(segment[:token_end].encode('utf-8'))
+        return token_type, value, start, self.pos
@@ -0,0 +1,54 @@
+import re
+from bisect import bisect_right
+from typing import List, Optional, Tuple
+
+NEWLINE = re.compile('\n')
+BYTES_NEWLINE = re.compile(b'\n')
+
+
+class LineTable:
+    """Resolves character offsets in one source text to line and column.
+
+    Tokens and AST locations only store offsets. The table of line start
+    offsets is built the first time a line or column is asked for (an error
+    message, an encoder), and each lookup is a binary search in it.
+
+    The text may also be a UTF-8 bytes buffer (see Lexer); offsets are then
+    byte offsets, but columns still count characters.
+    """
+
+    __slots__ = ('text', 'file', '_line_starts')
+
+    def __init__(self, text: str, file: str = '<unknown>'):
+        self.text = text
+        self.file = file
+        self._line_starts: Optional[List[int]] = None
+
+    @property
+    def line_starts(self) -> List[int]:
+        """Offset of the first character of every line"""
+        if self._line_starts is None:
+            # Scanned in place: the text may be a large mmap-backed buffer
+            newline = NEWLINE if isinstance(self.text, str) else BYTES_NEWLINE
+            self._line_starts = [0]
+            self._line_starts.extend(match.end() for match in newline.finditer(self.text))
+        return self._line_starts
+
+    def line_column(self, offset: int) -> Tuple[int, int]:
+        """Return the 1-based (line, column) of an offset"""
+        line_starts = self.line_starts
+        line = bisect_right(line_starts, offset)
+        line_start = line_starts[line - 1]
+        if not isinstance(self.text, str):
+            return line, len(self.text[line_start:offset].decode('utf-8', 'replace')) + 1
+        return line, offset - line_start + 1
+
+    def line_text(self, line: int) -> str:
+        """Return the text of a 1-based line, without its line break"""
+        line_starts = self.line_starts
+        start = line_starts[line - 1]
+        end = line_starts[line] - 1 if line < len(line_starts) else len(self.text)
+        text = self.text[start:end]
+        if not isinstance(text, str):
+            text = bytes(text).decode('utf-8', 'replace')
+        return text.rstrip('\r')
@@ -0,0 +1,142 @@
+import codecs
+from bisect import bisect_right
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
+
+from .lexer import Lexer
+from .tokens import TokenTypes, Token
+from .symbols import SymbolTable
+
+
+class WindowLineTable:
+    """Line table for one window of a stream.
+
+    Knows the line number and line start at the window's base offset plus
+    the line starts inside the window, which is all that tokens lexed from
+    the window need to resolve their (absolute) offsets.
+    """
+
+    __slots__ = ('file', 'first_line', 'first_line_start', 'line_starts')
+
+    def __init__(self, text: str, base: int, first_line: int, first_line_start: int, file: str):
+        self.file = file
+        self.first_line = first_line
+        self.first_line_start = first_line_start
+        self.line_starts: List[int] = []
+        newline = text.find('\n')
+        while newline != -1:
+            self.line_starts.append(base + newline + 1)
+            newline = text.find('\n', newline + 1)
+
+    def line_column(self, offset: int) -> Tuple[int, int]:
+        """Return the 1-based (line, column) of an offset inside the window"""
+        index = bisect_right(self.line_starts, offset)
+        line_start = self.line_starts[index - 1] if index else self.first_line_start
+        return self.first_line + index, offset - line_start + 1
+
+
+class StreamingLexer:
+    """Lexer that pulls its input in chunks.
+
+    The source is a file-like object (read in chunk_size pieces) or any
+    iterable of chunks; bytes are decoded as UTF-8 incrementally. Only the
+    unconsumed tail of the input is kept: a token or comment that reaches
+    the end of the current window is re-lexed once more input has been
+    appended (at least as much as the window held), so strings, block
+    comments and operators like '->' may be split anywhere. Tokens are the same as Lexer produces for the whole
+    text, with character offsets.
+    """
+
+    def __init__(self, source: Union[Iterable, object], filename: str = '<stream>',
+                 symbols: Optional[SymbolTable] = None, chunk_size: int = 1 << 16):
+        self.source = source
+        self.filename = filename
+        self.symbols = symbols if symbols is not None else SymbolTable()
+        self.chunk_size = chunk_size
+        self._tokens = self.tokens()
+        self._eof_token: Optional[Token] = None
+
+    def _read(self) -> Iterator[Union[str, bytes]]:
+        """Read chunks until the file-like source returns an empty one"""
+        while True:
+            chunk = self.source.read(self.chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+    def _chunks(self) -> Iterator[str]:
+        """Yield the input as str chunks, decoding bytes incrementally"""
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        for chunk in self._read() if hasattr(self.source, 'read') else self.source:
+            yield chunk if isinstance(chunk, str) else decoder.decode(chunk)
+        yield decoder.decode(b'', final=True)
+
+    def tokens(self) -> Iterator[Token]:
+        """Generate tokens up to and including EOF"""
+        chunks = self._chunks()
+        text = ''
+        base = 0
+        line, line_start = 1, 0
+        exhausted = False
+        window = None
+
+        while True:
+            if window is None:
+                # Start a window on the unconsumed text, topped up by at
+                # least as much new input (and at least one chunk): a token
+                # spanning many chunks doubles the window each time it is
+                # re-lexed, so it is lexed in linear total time
+                if not exhausted:
+                    pieces = [text]
+                    added = 0
+                    while not added or added < len(text):
+                        chunk = next(chunks, None)
+                        if chunk is None:
+                            exhausted = True
+                            break
+                        pieces.append(chunk)
+                        added += len(chunk)
+                    text = ''.join(pieces)
+                window = Lexer(text, self.filename, self.symbols)
+                window.base = base
+                window.lines = WindowLineTable(text, base, line, line_start, self.filename)
+
+            start = window.pos
+            try:
+                kind, value, token_start, token_end = window.scan()
+            except SyntaxError:
+                # Only an error found at the end of the window (a string
+                # still open there) may go away with more input
+                if exhausted or window.pos < len(text):
+                    raise
+            else:
+                if exhausted:
+                    yield Token(kind, value, base + token_start, base + token_end, window.lines)
+                    if kind is TokenTypes.EOF:
+                        return
+                    continue
+                # Anything reaching the end of the window may continue in the
+                # next chunk
+                if token_end < len(text):
+                    yield Token(kind, value, base + token_start, base + token_end, window.lines)
+                    continue
+
+            # Drop the consumed text and continue lexing with more input
+            line += text.count('\n', 0, start)
+            last_newline = text.rfind('\n', 0, start)
+            if last_newline != -1:
+                line_start = base + last_newline + 1
+            text = text[start:]
+            base += start
+            window = None
+
+    def get_next_token(self) -> Token:
+        """Return the next token, or EOF once the input is exhausted"""
+        if self._eof_token is not None:
+            return self._eof_token
+        token = next(self._tokens)
+        if token.type is TokenTypes.EOF:
+            self._eof_token = token
+        return token
+
+    def __iter__(self) -> Iterator[Token]:
+        return self._tokens
@@ -0,0 +1,38 @@
+from typing import Dict, List
+
+
+class SymbolTable:
+    """Intern table for identifier and keyword spellings.
+
+    The lexer passes every name through one table per compilation, so each
+    distinct name exists as a single str object (later comparisons can use
+    `is`) and has a stable integer id in order of first appearance.
+    """
+
+    __slots__ = ('ids', 'names')
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.names: List[str] = []
+
+    def intern(self, name: str) -> str:
+        """Return the canonical str object for name"""
+        return self.names[self.symbol_id(name)]
+
+    def symbol_id(self, name: str) -> int:
+        """Return the integer id of name, interning it if needed"""
+        symbol_id = self.ids.get(name)
+        if symbol_id is None:
+            symbol_id = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return symbol_id
+
+    def name(self, symbol_id: int) -> str:
+        """Return the name with the given id"""
+        return self.names[symbol_id]
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.ids
@@ -0,0 +1,207 @@
+from array import array
+from bisect import bisect_left
+from typing import Any, List, Tuple
+
+from .tokens import TokenTypes, Token
+from .lexer import Lexer, KEYWORDS, OPERATORS
+from .line_table import LineTable
+from .symbols import SymbolTable
+
+# TokenTypes by value, since TokenTypes(value) is a slow Enum call
+KIND_BY_VALUE: List[TokenTypes] = [None] * (max(kind.value for kind in TokenTypes) + 1)
+for _kind in TokenTypes:
+    KIND_BY_VALUE[_kind.value] = _kind
+
+# Tokens whose value is a name: data holds its symbol id
+NAME_KINDS = {TokenTypes.IDENT.value} | {
+    kind.value for kind in KEYWORDS.values() if kind is not TokenTypes.BOOL
+}
+# Tokens whose value is a literal: data holds its index in literals
+LITERAL_KINDS = {
+    TokenTypes.INTEGER.value, TokenTypes.FLOAT.value,
+    TokenTypes.STRING.value, TokenTypes.BOOL.value,
+}
+# Everything else is spelled the same every time (None for EOF)
+SPELLINGS: List[Any] = [None] * len(KIND_BY_VALUE)
+for _spelling, _kind in OPERATORS.items():
+    SPELLINGS[_kind.value] = _spelling
+
+
+class TokenStream:
+    """All tokens of one text, stored as parallel arrays.
+
+    Each token costs a kind (array 'H'), start/end offsets (array 'i') and
+    one data slot (array 'I'): a symbol id for names, an index into the
+    literals side table for literals, unused otherwise. Token objects are
+    only built when indexed, so a parser reading the stream by index never
+    holds more than a handful of them.
+
+    Edits shift the offsets of later tokens lazily: starts and ends from
+    index shifted on are stored without shift, the size change not yet
+    applied to them, which start(), end() and indexing add when reading.
+    Literal slots of tokens removed by an edit are listed in free_literals
+    and reused, so the side table does not grow with every edit.
+    """
+
+    __slots__ = (
+        'kinds', 'starts', 'ends', 'data', 'literals', 'free_literals',
+        'shifted', 'shift', 'lines', 'symbols',
+    )
+
+    def __init__(self, lines: LineTable, symbols: SymbolTable):
+        self.kinds = array('H')
+        self.starts = array('i')
+        self.ends = array('i')
+        self.data = array('I')
+        self.literals: List[Any] = []
+        self.free_literals: List[int] = []
+        self.shifted = 0
+        self.shift = 0
+        self.lines = lines
+        self.symbols = symbols
+
+    @classmethod
+    def from_lexer(cls, lexer) -> 'TokenStream':
+        """Lex the whole input of lexer, up to and including EOF"""
+        stream = cls(lexer.lines, lexer.symbols)
+        append = stream.append
+        scan = lexer.scan
+        while True:
+            kind, value, start, end = scan()
+            append(kind, value, start, end)
+            if kind is TokenTypes.EOF:
+                return stream
+
+    @property
+    def filename(self) -> str:
+        return self.lines.file
+
+    def append(self, kind: TokenTypes, value: Any, start: int, end: int):
+        kind_value = kind._value_
+        if kind_value in NAME_KINDS:
+            self.data.append(self.symbols.ids[value])
+        elif kind_value in LITERAL_KINDS:
+            self.data.append(len(self.literals))
+            self.literals.append(value)
+        else:
+            self.data.append(0)
+        self.kinds.append(kind_value)
+        self.starts.append(start - self.shift)
+        self.ends.append(end - self.shift)
+
+    def apply_edit(self, offset: int, removed: int, inserted) -> Tuple[int, int, int]:
+        """Update the stream for a text edit, re-lexing as little as possible.
+
+        removed characters at offset are replaced by inserted. Lexing is
+        context free, so it restarts at the end of the last token before the
+        edit (an edit touching a token re-lexes that token too) and stops as
+        soon as a new token starts where an old token after the edit, shifted
+        by the size change, started: from there on both streams agree.
+
+        The tokens after that point are not touched: the size change is
+        added to the pending shift. Only the tokens between the previous
+        edit and this one have the old shift applied (or taken out), so a
+        run of edits close together costs about the size of the edits.
+
+        Returns (index, old_count, new_count): old tokens [index, index +
+        old_count) were replaced by new_count re-lexed tokens.
+        """
+        old_text = self.lines.text
+        text = old_text[:offset] + inserted + old_text[offset + removed:]
+        delta = len(inserted) - removed
+        lexer = Lexer(text, self.lines.file, self.symbols)
+
+        first = self._bisect(self.ends, offset)
+        lexer.pos = self.end(first - 1) if first else 0
+        # Old tokens at or after the end of the edit are resync candidates
+        old = self._bisect(self.starts, offset + removed)
+        count = len(self.kinds)
+
+        fresh = TokenStream(lexer.lines, self.symbols)
+        while True:
+            kind, value, start, end = lexer.scan()
+            while old < count and self.start(old) + delta < start:
+                old += 1
+            if old < count and self.start(old) + delta == start:
+                break
+            fresh.append(kind, value, start, end)
+
+        # Free the literal slots of the replaced tokens, then fill them
+        literals, free = self.literals, self.free_literals
+        for index in range(first, old):
+            if self.kinds[index] in LITERAL_KINDS:
+                literals[self.data[index]] = None
+                free.append(self.data[index])
+        for index, kind_value in enumerate(fresh.kinds):
+            if kind_value in LITERAL_KINDS:
+                value = fresh.literals[fresh.data[index]]
+                if free:
+                    slot = free.pop()
+                    literals[slot] = value
+                else:
+                    slot = len(literals)
+                    literals.append(value)
+                fresh.data[index] = slot
+
+        # Make the pending shift start at old: apply it to the tokens
+        # between shifted and the edit, or take it out of those between
+        # the edit and shifted
+        if self.shifted < first:
+            self._add_to_offsets(self.shifted, first, self.shift)
+        elif self.shifted > old:
+            self._add_to_offsets(old, self.shifted, -self.shift)
+
+        self.kinds[first:old] = fresh.kinds
+        self.data[first:old] = fresh.data
+        self.starts[first:old] = fresh.starts
+        self.ends[first:old] = fresh.ends
+        self.shifted = first + len(fresh.kinds)
+        self.shift += delta
+        self.lines = lexer.lines
+        return first, old - first, len(fresh.kinds)
+
+    def _bisect(self, offsets: array, offset: int) -> int:
+        """bisect_left for offset in starts or ends, as shifted"""
+        index = bisect_left(offsets, offset, 0, self.shifted)
+        if index < self.shifted:
+            return index
+        return bisect_left(offsets, offset - self.shift, index)
+
+    def _add_to_offsets(self, begin: int, stop: int, amount: int):
+        """Add amount to the stored starts and ends of tokens [begin, stop)"""
+        if amount:
+            self.starts[begin:stop] = array('i', [start + amount for start in self.starts[begin:stop]])
+            self.ends[begin:stop] = array('i', [end + amount for end in self.ends[begin:stop]])
+
+    def kind(self, index: int) -> TokenTypes:
+        return KIND_BY_VALUE[self.kinds[index]]
+
+    def value(self, index: int) -> Any:
+        kind_value = self.kinds[index]
+        if kind_value in NAME_KINDS:
+            return self.symbols.names[self.data[index]]
+        if kind_value in LITERAL_KINDS:
+            return self.literals[self.data[index]]
+        return SPELLINGS[kind_value]
+
+    def start(self, index: int) -> int:
+        if index < 0:
+            index += len(self.kinds)
+        return self.starts[index] + self.shift if index >= self.shifted else self.starts[index]
+
+    def end(self, index: int) -> int:
+        if index < 0:
+            index += len(self.kinds)
+        return self.ends[index] + self.shift if index >= self.shifted else self.ends[index]
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def __getitem__(self, index: int) -> Token:
+        if index < 0:
+            index += len(self.kinds)
+        shift = self.shift if index >= self.shifted else 0
+        return Token(
+            KIND_BY_VALUE[self.kinds[index]], self.value(index),
+            self.starts[index] + shift, self.ends[index] + shift, self.lines
+        )
@@ -1,6 +1,7 @@
 from enum import Enum, auto
-from dataclasses import dataclass
-from typing import Any
+from dataclasses import dataclass, field
+from typing import Any, Optional
+from .line_table import LineTable
 
 class TokenTypes(Enum):
     # Keywords
@@ -70,14 +71,28 @@ class TokenTypes(Enum):
     # Special
     EOF = auto()
     EOL = auto()
+    ERROR = auto()  # text the lexer rejected, in lexer errors
 
 @dataclass
 class Token:
-    """Token class representing a lexical token"""
+    """Token class representing a lexical token.
+
+    Only the start/end offsets are stored; line and column are resolved
+    through the lexer's line table when they are read.
+    """
     type: TokenTypes
     value: Any
-    line: int
-    column: int
+    start: int
+    end: int
+    lines: Optional[LineTable] = field(default=None, repr=False, compare=False)
+
+    @property
+    def line(self) -> int:
+        return self.lines.line_column(self.start)[0]
+
+    @property
+    def column(self) -> int:
+        return self.lines.line_column(self.start)[1]
 
     def __str__(self):
         return f"Token({self.type.name}, {repr(self.value)}, line={self.line}, col={self.column})"
@@ -1,9 +1,11 @@
 import sys
 import argparse
-from src.shard.lexer import Lexer
-from src.shard.parser import Parser
+from pathlib import Path
+from src.shard.lexer import Lexer, TokenTypes
+from src.shard.parser import Parser, ParseError, parse_parallel
 from src.shard.encoders.json_encoder import ASTJsonEncoder, encode_ast_as_json
 from src.shard.encoders.alt_encoder import encode_ast_as_alt
+from src.shard.encoders.binary_encoder import encode_ast_as_binary
 
 def main():
     # Set up argument parser
@@ -12,6 +14,9 @@ def main():
     arg_parser.add_argument('--print_tokens', action='store_true', help='Print tokens after lexical analysis')
     arg_parser.add_argument('--print_ast', action='store_true', help='Print AST in JSON format')
     arg_parser.add_argument('--print_alt', action='store_true', help='Print AST in alternative readable format')
+    arg_parser.add_argument('--all_errors', action='store_true', help='Recover from syntax errors and report all of them')
+    arg_parser.add_argument('--jobs', type=int, default=1, help='Parse top-level declarations in this many processes')
+    arg_parser.add_argument('--save_ast', metavar='PATH', help='Write the AST in binary format to PATH')
     
     args = arg_parser.parse_args()
 
@@ -20,8 +25,8 @@ def main():
     print(f"[1] Reading source code from: {args.file}")
     
     try:
-        with open(args.file, 'r') as file:
-            input_text = file.read()
+        # The file is memory-mapped and lexed as UTF-8 bytes in place
+        lexer = Lexer(Path(args.file), filename=args.file)
     except FileNotFoundError:
         print(f"Error: Could not find file '{args.file}'")
         sys.exit(1)
@@ -32,18 +37,17 @@ def main():
     print("    ✓ Source code loaded")
     print("    First 100 characters:")
     print("    ------------------------------")
-    print(input_text[:100] + ("..." if len(input_text) > 100 else ""))
+    print(lexer.text[:100].decode('utf-8', 'ignore') + ("..." if len(lexer.text) > 100 else ""))
     print("    ------------------------------\n")
 
     print("[2] Initializing lexer...")
-    lexer = Lexer(input_text)
     print("    ✓ Lexer initialized\n")
 
     if args.print_tokens:
         print("[2.5] Tokenizing source code...")
         # Only collect tokens if we need to print them
         tokens = []
-        token_lexer = Lexer(input_text)  # Create a separate lexer for token printing
+        token_lexer = Lexer(lexer.text, filename=args.file)  # Create a separate lexer for token printing
         while True:
             token = token_lexer.get_next_token()
             tokens.append(token)
@@ -60,13 +64,23 @@ def main():
             print(f"    {token.line:<4} | {token.column:<6} | {token.type.name:<8} | {value}")
         print()
 
-    print("[3] Initializing parser...")
-    parser = Parser(lexer)
-    print("    ✓ Parser initialized\n")
-
-    print("[4] Parsing Abstract Syntax Tree (AST)...")
     try:
-        ast = parser.parse()
+        print("[3] Initializing parser...")
+        parser = Parser(lexer)
+        print("    ✓ Parser initialized\n")
+
+        print("[4] Parsing Abstract Syntax Tree (AST)...")
+        if args.all_errors:
+            ast, errors = parser.parse_with_recovery()
+            for error in errors:
+                print(error if isinstance(error, ParseError) else f"Error: {error}")
+            if errors:
+                print(f"    ✗ {len(errors)} syntax error(s)")
+                sys.exit(1)
+        elif args.jobs > 1:
+            ast = parse_parallel(lexer.text, args.file, workers=args.jobs)
+        else:
+            ast = parser.parse()
         print("    ✓ AST generated\n")
     except SyntaxError as e:
         print(f"Error during parsing: {e}")
@@ -83,6 +97,10 @@ def main():
         print("\nAST (Alternative format):")
         print(encode_ast_as_alt(ast))
 
+    if args.save_ast:
+        Path(args.save_ast).write_bytes(encode_ast_as_binary(ast))
+        print(f"\n    ✓ Binary AST written to {args.save_ast}")
+
     print("\n[5] Compilation complete.")
 
 if __name__ == '__main__':
@@ -1,13 +1,18 @@
 from .parser import Parser
-from .base_parser import BaseParser
+from .base_parser import BaseParser, ParseError
 from .expression_parser import ExpressionParser
 from .statement_parser import StatementParser
 from .declaration_parser import DeclarationParser
+from .incremental import IncrementalParser
+from .parallel import parse_parallel
 
 __all__ = [
     'Parser',
     'BaseParser', 
+    'ParseError',
     'ExpressionParser',
     'StatementParser',
-    'DeclarationParser'
+    'DeclarationParser',
+    'IncrementalParser',
+    'parse_parallel'
 ]
\ No newline at end of file
@@ -1,84 +1,421 @@
-from typing import Set, Dict, Optional
-from dataclasses import dataclass
+import functools
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Set, Dict, List, Optional, Callable
 from ..lexer.tokens import TokenTypes, Token
+from ..lexer.token_stream import TokenStream
+from ..lexer.errors import ParseError
+from ..ast_nodes.base import SourceLocation
 
-@dataclass
-class SourceLocation:
-    line: int
-    column: int
-    length: int
-    file: str
-    position: int
+def memoize(rule: Callable) -> Callable:
+    """Mark a parse rule to be memoized when the parser runs in packrat mode.
+
+    Marked rules are wrapped per parser instance, so a parser without
+    packrat mode calls them directly at no extra cost.
+    """
+    rule.memoized = True
+    return rule
 
 class BaseParser:
     """Base parser class with common utilities and error handling"""
-    
-    def __init__(self, lexer):
+
+    # Number of tokens lexed ahead whenever the buffer runs dry
+    LEX_BATCH: int = 64
+
+    OPENING_BRACKETS: Set[TokenTypes] = {TokenTypes.LPAREN, TokenTypes.LBRACE}
+    # Closing bracket -> the opener it pairs with
+    CLOSING_BRACKETS: Dict[TokenTypes, TokenTypes] = {
+        TokenTypes.RPAREN: TokenTypes.LPAREN,
+        TokenTypes.RBRACE: TokenTypes.LBRACE,
+    }
+    BRACKET_TEXT: Dict[TokenTypes, str] = {
+        TokenTypes.LPAREN: '(',
+        TokenTypes.RPAREN: ')',
+        TokenTypes.LBRACE: '{',
+        TokenTypes.RBRACE: '}',
+    }
+
+    def __init__(self, lexer, packrat: bool = False, memo_size: int = 4096, debug: bool = False):
         self.lexer = lexer
-        self.current_token = self.lexer.get_next_token()
+        # Debug mode: syntax errors carry the parser's call stack
+        self.debug = debug
+        # Packrat mode: results of @memoize rules, keyed by (rule, token
+        # index, arguments) and evicted least recently used first
+        self.packrat = packrat
+        self.memo_size = memo_size
+        self.memo: OrderedDict = OrderedDict()
+        self.memo_hits = 0
+        self.memo_misses = 0
+        if packrat:
+            for name in dir(type(self)):
+                if getattr(getattr(type(self), name, None), 'memoized', False):
+                    setattr(self, name, self._memoized_rule(name, getattr(self, name)))
+        # Tokens are lexed once, on demand, into token_buffer; current_pos is
+        # the index of current_token in it. eat/peek only move the index.
         self.token_buffer = []
         self.current_pos = 0
+        # Opening bracket index -> index of its matching closer. Brackets are
+        # paired lazily, by prescan() or the first matching_bracket() that
+        # needs them, up to index bracket_scan; open_brackets holds the
+        # openers not closed yet
+        self.bracket_matches: Dict[int, int] = {}
+        self.open_brackets: List[int] = []
+        self.bracket_scan = 0
+        # Closing brackets that pair with nothing, found in recovery mode
+        self.stray_brackets: List[int] = []
+        if isinstance(lexer, TokenStream):
+            # A pre-lexed stream is read by index in place of the buffer;
+            # its Token objects are only built as the parser reaches them
+            self.token_buffer = lexer
         self.current_file = lexer.filename if hasattr(lexer, 'filename') else '<unknown>'
+        # Recovery mode: errors in blocks and declarations are collected in
+        # errors and parsing resumes after them (Parser.parse_with_recovery)
+        self.recovering = False
+        self.errors: List[SyntaxError] = []
+        self.current_token = self.token_at(0)
+
+    def _memoized_rule(self, name: str, rule: Callable) -> Callable:
+        """Wrap a bound rule with the (rule, token index, arguments) memo table.
+
+        A hit rewinds the parser to where the cached parse ended and returns
+        the cached node, or raises a new copy of the cached SyntaxError if
+        the rule failed there. Failures are stored as the exception's
+        constructor call, so the memo holds no traceback or frames. The key
+        includes recovery mode, since a rule that fails while speculating
+        may recover from the same error in recovery mode.
+        """
+        memo = self.memo
+
+        @functools.wraps(rule)
+        def wrapper(*args, **kwargs):
+            start = self.current_pos
+            key = (name, start, self.recovering,
+                   tuple(tuple(arg) if isinstance(arg, list) else arg for arg in args),
+                   tuple(sorted(kwargs.items())))
+            entry = memo.get(key)
+            if entry is not None:
+                self.memo_hits += 1
+                memo.move_to_end(key)
+                result, end, failure = entry
+                if failure is not None:
+                    error_class, error_args = failure
+                    raise error_class(*error_args)
+                self.reset(end)
+                return result
+
+            self.memo_misses += 1
+            try:
+                result = rule(*args, **kwargs)
+            except SyntaxError as failure:
+                memo[key] = (None, start, failure.__reduce__()[:2])
+                raise
+            else:
+                memo[key] = (result, self.current_pos, None)
+                return result
+            finally:
+                if len(memo) > self.memo_size:
+                    memo.popitem(last=False)
+
+        return wrapper
+
+    def token_at(self, index: int) -> Token:
+        """Return the token at a buffer index, lexing up to it if needed"""
+        buffer = self.token_buffer
+        if index >= len(buffer):
+            # Lex a batch past the requested index so that subsequent eat()
+            # calls stay on the fast path
+            lexer = self.lexer
+            stop = index + self.LEX_BATCH
+            while len(buffer) <= stop:
+                if buffer and buffer[-1].type is TokenTypes.EOF:
+                    return buffer[min(index, len(buffer) - 1)]
+                try:
+                    buffer.append(lexer.get_next_token())
+                except ParseError as error:
+                    # Rejected text is buffered as an ERROR token holding
+                    # the error, which is raised when the parser gets there
+                    # (or reported by prescan), not while lexing ahead
+                    lines = error.token.lines
+                    buffer.append(Token(TokenTypes.ERROR, error, error.start, error.end, lines))
+                    if hasattr(lexer, 'skip_error'):
+                        lexer.skip_error(error)
+                    else:
+                        # The lexer cannot go on: the input ends here
+                        buffer.append(Token(TokenTypes.EOF, None, error.end, error.end, lines))
+        return buffer[index]
+
+    def _index_brackets(self, stop: Optional[int] = None):
+        """Pair the brackets of the buffered tokens before stop (all by default).
+
+        Raises a ParseError for a closing bracket that does not match, for
+        text the lexer rejected and, once EOF is reached, for a bracket left
+        open. In recovery mode they are recorded in errors instead.
+        """
+        buffer = self.token_buffer
+        if isinstance(buffer, TokenStream):
+            self._index_stream_brackets()
+            return
+        if stop is None:
+            stop = len(buffer)
+        open_brackets = self.open_brackets
+        index = self.bracket_scan
+        try:
+            for index in range(self.bracket_scan, stop):
+                kind = buffer[index].type
+                if kind is TokenTypes.LPAREN or kind is TokenTypes.LBRACE:
+                    open_brackets.append(index)
+                elif kind is TokenTypes.RPAREN or kind is TokenTypes.RBRACE:
+                    self._close_bracket(index)
+                elif kind is TokenTypes.ERROR:
+                    self._report(buffer[index].value)
+            else:
+                index = max(stop, self.bracket_scan)
+        finally:
+            # A closer that raised is checked again by the next call
+            self.bracket_scan = index
+        if open_brackets and index == len(buffer) and buffer[-1].type is TokenTypes.EOF:
+            self._unclosed_brackets()
+
+    def _index_stream_brackets(self):
+        """Pair every bracket of a TokenStream, reading only its kind array"""
+        kinds = self.token_buffer.kinds
+        open_brackets = self.open_brackets
+        matches = self.bracket_matches
+        lparen, lbrace = TokenTypes.LPAREN.value, TokenTypes.LBRACE.value
+        rparen, rbrace = TokenTypes.RPAREN.value, TokenTypes.RBRACE.value
+        index = self.bracket_scan
+        try:
+            for index in range(self.bracket_scan, len(kinds)):
+                kind = kinds[index]
+                if kind == lparen or kind == lbrace:
+                    open_brackets.append(index)
+                elif kind == rparen or kind == rbrace:
+                    expected = lparen if kind == rparen else lbrace
+                    if open_brackets and kinds[open_brackets[-1]] == expected:
+                        matches[open_brackets.pop()] = index
+                    else:
+                        self._close_bracket(index)
+            else:
+                index = len(kinds)
+        finally:
+            self.bracket_scan = index
+        if open_brackets:
+            self._unclosed_brackets()
+
+    def _close_bracket(self, index: int):
+        """Pair the closing bracket at index with the innermost open bracket.
+
+        In recovery mode an unbalanced closer is recorded and the index goes
+        on: one that closes an outer bracket also closes those opened since
+        (just before it), and one that closes nothing is a stray bracket.
+        """
+        buffer = self.token_buffer
+        open_brackets = self.open_brackets
+        closer = buffer[index]
+        expected = self.CLOSING_BRACKETS[closer.type]
+        if open_brackets and buffer[open_brackets[-1]].type is expected:
+            self.bracket_matches[open_brackets.pop()] = index
+            return
+        if not open_brackets:
+            self._report(ParseError(
+                'unmatched-bracket', f"Unmatched '{self.BRACKET_TEXT[closer.type]}'", closer
+            ))
+        else:
+            opener = buffer[open_brackets[-1]]
+            closing = '}' if opener.type is TokenTypes.LBRACE else ')'
+            self._report(ParseError(
+                'mismatched-bracket',
+                f"Mismatched '{self.BRACKET_TEXT[closer.type]}', "
+                f"expected '{closing}' to close '{self.BRACKET_TEXT[opener.type]}'",
+                closer,
+            ))
+        for position in range(len(open_brackets) - 1, -1, -1):
+            if buffer[open_brackets[position]].type is expected:
+                for opener in open_brackets[position + 1:]:
+                    self.bracket_matches[opener] = index - 1
+                self.bracket_matches[open_brackets[position]] = index
+                del open_brackets[position:]
+                return
+        self.stray_brackets.append(index)
+
+    def _unclosed_brackets(self):
+        """Report the brackets still open at the end of input.
+
+        Only the innermost one is raised; recovery mode records them all
+        and lets each one close at EOF.
+        """
+        buffer = self.token_buffer
+        for opener in reversed(self.open_brackets):
+            token = buffer[opener]
+            self._report(ParseError('unclosed-bracket', f"Unclosed '{self.BRACKET_TEXT[token.type]}'", token))
+            self.bracket_matches[opener] = len(buffer) - 1
+        self.open_brackets = []
+
+    def _report(self, error: ParseError):
+        """Raise an error found ahead of the parser, or record it in recovery mode"""
+        if not self.recovering:
+            raise error
+        self.record_error(error)
+
+    def record_error(self, error: ParseError):
+        """Add error to errors, unless one was already reported at its position.
 
-    def error(self, message: str):
-        """Raise a syntax error with traceback information"""
-        import traceback
-        error_msg = f"⚠️  Error at line {self.current_token.line}: {message}\n"
-        error_msg += "Traceback (most recent call last):\n"
-        error_msg += ''.join(traceback.format_stack()[:-1])
-        error_msg += f"Current token: {self.current_token}\n"
-        error_msg += f"Parser state: pos={self.lexer.pos}, line={self.lexer.line}, column={self.lexer.column}"
-        raise SyntaxError(error_msg)
+        The bracket index and the lexer report some errors before the parser
+        reaches them, and the parser then fails at the same token; after an
+        unclosed bracket it fails at the end of input.
+        """
+        if error.token.type is TokenTypes.EOF:
+            if any(seen.code == 'unclosed-bracket' for seen in self.errors):
+                return
+        if all(seen.start != error.start for seen in self.errors):
+            self.errors.append(error)
+
+    def skip_stray_brackets(self):
+        """Drop the stray closing brackets found in recovery mode from the buffer.
+
+        The parser then reads on as if they were not there. Only the tokens
+        of a buffer can be dropped, not those of a TokenStream.
+        """
+        strays = self.stray_brackets
+        if not strays or not isinstance(self.token_buffer, list):
+            return
+        buffer = self.token_buffer
+        dropped = set(strays)
+        self.token_buffer = [token for index, token in enumerate(buffer) if index not in dropped]
+
+        def renumber(index: int) -> int:
+            return index - bisect_left(strays, index)
+
+        self.bracket_matches = {
+            renumber(opener): renumber(closer) for opener, closer in self.bracket_matches.items()
+        }
+        self.open_brackets = [renumber(opener) for opener in self.open_brackets]
+        self.bracket_scan = renumber(self.bracket_scan)
+        self.stray_brackets = []
+        self.memo.clear()
+        self.reset(renumber(self.current_pos))
+
+    def prescan(self):
+        """Lex the rest of the input up front and pair every bracket.
+
+        Unbalanced brackets are reported with their exact location before
+        parsing starts.
+        """
+        buffer = self.token_buffer
+        while buffer[-1].type is not TokenTypes.EOF:
+            self.token_at(len(buffer))
+        self._index_brackets()
+
+    def discard_consumed_tokens(self):
+        """Drop the buffered tokens before the current one.
+
+        Buffer indices are renumbered from the current token, so this is
+        only safe where nothing refers back: no mark, memo entry or open
+        bracket from before it may be used afterwards (between top-level
+        declarations, say). A TokenStream is left untouched.
+        """
+        consumed = self.current_pos
+        if not consumed or not isinstance(self.token_buffer, list):
+            return
+        # Pair the brackets of the tokens that go, so the open ones carry over
+        self._index_brackets(consumed)
+        del self.token_buffer[:consumed]
+        self.bracket_scan -= consumed
+        self.bracket_matches = {
+            opener - consumed: closer - consumed
+            for opener, closer in self.bracket_matches.items() if opener >= consumed
+        }
+        self.open_brackets = [opener - consumed for opener in self.open_brackets]
+        self.memo.clear()
+        self.current_pos = 0
+
+    def error(self, message: str, code: str = 'invalid-syntax'):
+        """Raise a ParseError at the current token.
+
+        At text the lexer rejected, its error is raised instead.
+        """
+        if self.current_token.type is TokenTypes.ERROR:
+            raise self.current_token.value
+        stack = None
+        if self.debug:
+            import traceback
+            stack = ''.join(traceback.format_stack()[:-1])
+        raise ParseError(code, message, self.current_token, stack)
 
     def get_location(self) -> SourceLocation:
         """Get the current source location"""
-        return SourceLocation(
-            line=self.lexer.line,
-            column=self.lexer.column,
-            length=len(str(self.current_token.value)),
-            file=self.current_file,
-            position=self.lexer.pos
-        )
+        token = self.current_token
+        return SourceLocation(token.start, token.end, token.lines)
 
     def eat(self, token_type: Optional[TokenTypes] = None) -> Token:
         """Consume a token of the expected type"""
-        if token_type and self.current_token.type != token_type:
-            self.error(f"Expected {token_type.name}, got {self.current_token.type.name}")
         token = self.current_token
-        self.current_token = self.lexer.get_next_token()
+        if token_type and token.type != token_type:
+            self.error(f"Expected {token_type.name}, got {token.type.name}", 'expected-token')
+        self.current_pos += 1
+        if self.current_pos < len(self.token_buffer):
+            self.current_token = self.token_buffer[self.current_pos]
+        else:
+            self.current_token = self.token_at(self.current_pos)
         return token
 
     def peek(self, ahead: int = 1) -> Token:
         """Look ahead at tokens without consuming them"""
-        # Save lexer state
-        saved_pos = self.lexer.pos
-        saved_line = self.lexer.line
-        saved_column = self.lexer.column
-        saved_token = self.current_token
-        
-        # Get tokens
-        result = None
-        for _ in range(ahead):
-            result = self.lexer.get_next_token()
-            
-        # Restore lexer state
-        self.lexer.pos = saved_pos
-        self.lexer.line = saved_line
-        self.lexer.column = saved_column
-        
-        # Restore current token
-        self.current_token = saved_token
-        
-        return result
+        return self.token_at(self.current_pos + ahead)
+
+    def mark(self) -> int:
+        """Return a checkpoint of the current position in the token stream"""
+        return self.current_pos
+
+    def reset(self, mark: int):
+        """Rewind to a checkpoint returned by mark()"""
+        self.current_pos = mark
+        self.current_token = self.token_at(mark)
+
+    def speculate(self, rule: Callable, *args, **kwargs):
+        """Try a parse rule at the current position.
+
+        Returns the rule's result, or None with the position restored if it
+        raised a SyntaxError. In packrat mode a later attempt of the same
+        rule at the same position is answered from the memo table.
+        """
+        start = self.mark()
+        # A failed attempt is not an error to recover from
+        recovering, self.recovering = self.recovering, False
+        try:
+            return rule(*args, **kwargs)
+        except SyntaxError:
+            self.reset(start)
+            return None
+        finally:
+            self.recovering = recovering
+
+    def matching_bracket(self, index: int) -> int:
+        """Return the index of the token closing the bracket opened at index"""
+        matches = self.bracket_matches
+        if index in matches:
+            return matches[index]
+        buffer = self.token_buffer
+        self._index_brackets()
+        while index not in matches and buffer[-1].type is not TokenTypes.EOF:
+            self.token_at(len(buffer))
+            self._index_brackets()
+        return matches.get(index, len(buffer) - 1)
 
     def synchronize(self, sync_tokens: Set[TokenTypes]):
-        """Recover from errors by skipping to the next synchronization point"""
+        """Recover from errors by skipping to the next synchronization point.
+
+        Bracketed groups are skipped as a whole by jumping to their closer.
+        """
         while (self.current_token.type not in sync_tokens and 
                self.current_token.type != TokenTypes.EOF):
-            self.eat()
+            if self.current_token.type in self.OPENING_BRACKETS:
+                self.reset(self.matching_bracket(self.current_pos) + 1)
+            else:
+                self.eat()
 
     def expect_semicolon(self):
         """Enforce semicolon as statement terminator"""
         if self.current_token.type != TokenTypes.SEMICOLON:
-            self.error(f"Expected semicolon at end of statement, got {self.current_token.type.name}")
+            self.error(f"Expected semicolon at end of statement, got {self.current_token.type.name}", 'missing-semicolon')
         self.eat(TokenTypes.SEMICOLON) 
\ No newline at end of file
@@ -1,5 +1,6 @@
 from typing import List, Optional, Set, Union
 from .statement_parser import StatementParser
+from .base_parser import memoize
 from ..lexer.tokens import TokenTypes
 from ..ast_nodes import (
     TypeDef, ShardDef, ImplDef, FunctionDef,
@@ -49,7 +50,7 @@ class DeclarationParser(StatementParser):
     def parse_type(self) -> str:
         """Parse a type identifier"""
         if self.current_token.type not in {TokenTypes.IDENT, TokenTypes.STRING}:
-            self.error("Expected type identifier or string literal")
+            self.error("Expected type identifier or string literal", 'expected-name')
         type_name = self.current_token.value
         self.eat(self.current_token.type)
         return type_name
@@ -72,9 +73,9 @@ class DeclarationParser(StatementParser):
             # If it's a STRING token, it's likely a string literal inside a function body
             # This is a special case for handling common mistakes in syntax
             if self.current_token.type == TokenTypes.STRING:
-                self.error("String literals cannot be used as parameter names")
+                self.error("String literals cannot be used as parameter names", 'invalid-name')
             else:
-                self.error("Expected parameter name")
+                self.error("Expected parameter name", 'expected-name')
             
         name = self.current_token.value
         self.eat(TokenTypes.IDENT)
@@ -130,12 +131,13 @@ class DeclarationParser(StatementParser):
         self.eat(TokenTypes.RPAREN)
         return params
 
+    @memoize
     def parse_function_header(self, modifiers: List[TokenTypes]) -> FunctionDef:
         """Parse a function declaration header"""
         location = self.get_location()
         
         if self.current_token.type not in {TokenTypes.IDENT, TokenTypes.STRING}:
-            self.error(f"Expected function name or string literal")
+            self.error(f"Expected function name or string literal", 'expected-name')
             
         name = self.current_token.value
         self.eat(self.current_token.type)
@@ -158,7 +160,7 @@ class DeclarationParser(StatementParser):
         # Parse optional body
         body = None
         if self.current_token.type == TokenTypes.LBRACE:
-            body = self.parse_block()
+            body = self.parse_function_body()
         else:
             # Only expect semicolon for function declarations without a body
             self.expect_semicolon()
@@ -228,12 +230,13 @@ class DeclarationParser(StatementParser):
             location=location
         )
 
+    @memoize
     def parse_variable(self, modifiers: List[TokenTypes]) -> VariableDef:
         """Parse a variable declaration"""
         location = self.get_location()
         
         if self.current_token.type not in {TokenTypes.IDENT, TokenTypes.STRING}:
-            self.error("Expected identifier or string literal")
+            self.error("Expected identifier or string literal", 'expected-name')
             
         name = self.current_token.value
         self.eat(self.current_token.type)
@@ -244,7 +247,7 @@ class DeclarationParser(StatementParser):
             self.eat(TokenTypes.COLON)
             # We expect a type name (identifier)
             if self.current_token.type != TokenTypes.IDENT:
-                self.error(f"Expected type name, got {self.current_token.type.name}")
+                self.error(f"Expected type name, got {self.current_token.type.name}", 'expected-name')
             type_name = self.current_token.value  
             self.eat(TokenTypes.IDENT)
 
@@ -281,7 +284,7 @@ class DeclarationParser(StatementParser):
             )
             
         if self.current_token.type != TokenTypes.IDENT:
-            self.error("Expected type name after impl")
+            self.error("Expected type name after impl", 'expected-name')
             
         type_name = self.current_token.value
         self.eat(TokenTypes.IDENT)
@@ -292,7 +295,7 @@ class DeclarationParser(StatementParser):
             self.eat(TokenTypes.FOR)
             
             if self.current_token.type != TokenTypes.IDENT:
-                self.error("Expected type name after 'for'")
+                self.error("Expected type name after 'for'", 'expected-name')
                 
             for_type = self.current_token.value
             self.eat(TokenTypes.IDENT)
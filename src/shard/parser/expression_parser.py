@@ -1,13 +1,27 @@
-from typing import Dict, Optional, Any
-from .base_parser import BaseParser
+from typing import Dict, Optional, Any, Set, Union
+from .base_parser import BaseParser, memoize
 from ..lexer.tokens import TokenTypes
 from ..ast_nodes import (
-    Expression, BinaryOp, UnaryOp, Literal, 
-    Identifier, FunctionCall, AssignmentExpr, MemberAccess
+    Expression, BinaryOp, UnaryOp, Literal,
+    Identifier, FunctionCall, AssignmentExpr, MemberAccess, HashConsFactory
 )
 
+def construct_node(cls: type, location: Any, *fields: Any) -> Expression:
+    """Default node factory: a new node every time"""
+    return cls(*fields, location)
+
+def node_location(node: Expression) -> Any:
+    return node.location
+
 class ExpressionParser(BaseParser):
-    """Parser component for handling expressions"""
+    """Parser component for handling expressions.
+
+    Expressions are parsed with a table-driven Pratt loop: every token type
+    maps to an optional prefix handler (how an operand starts), a binding
+    power for infix operators and an optional postfix handler (member access
+    and calls). The tables are lists indexed by TokenTypes value, so dispatch
+    is one list lookup per token (via _value_, which skips the Enum property).
+    """
 
     # Operator precedence from lowest to highest
     PRECEDENCE: Dict[TokenTypes, int] = {
@@ -28,109 +42,283 @@ class ExpressionParser(BaseParser):
         TokenTypes.DIVIDE: 4,       # a / b
     }
 
+    # Binds tighter than any binary operator, looser than postfix . and ()
+    UNARY_PRECEDENCE: int = 5
+
+    # a = b = c parses as a = (b = c)
+    RIGHT_ASSOCIATIVE: Set[TokenTypes] = {
+        TokenTypes.ASSIGN,
+        TokenTypes.PLUS_ASSIGN,
+        TokenTypes.MINUS_ASSIGN,
+        TokenTypes.TIMES_ASSIGN,
+        TokenTypes.DIVIDE_ASSIGN,
+    }
+
+    # Token type -> method that parses an operand starting with it
+    PREFIX_RULES: Dict[TokenTypes, str] = {
+        TokenTypes.INTEGER: 'parse_literal',
+        TokenTypes.FLOAT: 'parse_literal',
+        TokenTypes.STRING: 'parse_literal',
+        TokenTypes.BOOL: 'parse_literal',
+        TokenTypes.IDENT: 'parse_identifier',
+        TokenTypes.LPAREN: 'parse_group',
+        TokenTypes.MINUS: 'parse_unary',
+        TokenTypes.NOT: 'parse_unary',
+    }
+
+    # Token type -> method that extends an operand (obj.member, f(args))
+    POSTFIX_RULES: Dict[TokenTypes, str] = {
+        TokenTypes.DOT: 'parse_member_access',
+        TokenTypes.LPAREN: 'parse_function_call',
+    }
+
+    LITERAL_TYPES: Set[TokenTypes] = {
+        TokenTypes.INTEGER, TokenTypes.FLOAT, TokenTypes.STRING, TokenTypes.BOOL,
+    }
+
+    def __init__(self, lexer, *args, iterative_expressions: bool = False,
+                 hash_cons: Union[bool, HashConsFactory] = False, **kwargs):
+        super().__init__(lexer, *args, **kwargs)
+        # Parse expressions with an explicit stack instead of recursion, for
+        # machine-generated input nested deeper than the recursion limit
+        self.iterative_expressions = iterative_expressions
+        # Expression nodes are built by make(cls, location, *fields); with
+        # hash_cons, equal subtrees are shared and their locations live in
+        # node_factory's side table (see HashConsFactory). Passing a factory
+        # shares it with other parsers, for instance across the files of a
+        # program.
+        if isinstance(hash_cons, HashConsFactory):
+            self.node_factory = hash_cons
+        else:
+            self.node_factory = HashConsFactory() if hash_cons else None
+        if self.node_factory is not None:
+            self.make = self.node_factory.make
+            self.location_of = self.node_factory.location_of
+        else:
+            self.make = construct_node
+            self.location_of = node_location
+        size = max(kind.value for kind in TokenTypes) + 1
+        self.prefix_table = [None] * size
+        self.postfix_table = [None] * size
+        self.precedence_table = [0] * size
+        for kind, rule in self.PREFIX_RULES.items():
+            self.prefix_table[kind.value] = getattr(self, rule)
+        for kind, rule in self.POSTFIX_RULES.items():
+            self.postfix_table[kind.value] = getattr(self, rule)
+        for kind, precedence in self.PRECEDENCE.items():
+            self.precedence_table[kind.value] = precedence
+
     def parse_primary_expression(self) -> Expression:
-        """Parse a primary expression (literals, identifiers, parenthesized expressions)"""
+        """Parse a primary expression (literals, identifiers, parenthesized and unary expressions)"""
+        token = self.current_token
+        prefix = self.prefix_table[token.type._value_]
+        if prefix is None:
+            self.error(f"Unexpected token {token.type.name}", 'unexpected-token')
+        return prefix()
+
+    def parse_literal(self) -> Literal:
+        """Parse an integer, float, string or boolean literal"""
         token = self.current_token
         location = self.get_location()
+        self.eat(token.type)
+        return self.make(Literal, location, token.value, token.type)
 
-        if token.type in {TokenTypes.INTEGER, TokenTypes.FLOAT, TokenTypes.STRING, TokenTypes.BOOL}:
-            self.eat(token.type)
-            return Literal(value=token.value, literal_type=token.type, location=location)
-            
-        elif token.type == TokenTypes.IDENT:
-            name = token.value
-            self.eat(TokenTypes.IDENT)
-            
-            # Function call
-            if self.current_token.type == TokenTypes.LPAREN:
-                return self.parse_function_call(name, location)
-                
-            # Create basic identifier
-            expr = Identifier(name=name, location=location)
-            
-            # Check for member access
-            while self.current_token.type == TokenTypes.DOT:
-                self.eat(TokenTypes.DOT)
-                
-                if self.current_token.type != TokenTypes.IDENT:
-                    self.error("Expected identifier after '.'")
-                    
-                member_name = self.current_token.value
-                member_location = self.get_location()
-                self.eat(TokenTypes.IDENT)
-                
-                # Create member access expression
-                expr = MemberAccess(
-                    object=expr,
-                    member=Identifier(name=member_name, location=member_location),
-                    location=location
-                )
-                
-                # Check if this is a method call
-                if self.current_token.type == TokenTypes.LPAREN:
-                    return self.parse_function_call(expr, location)
-                    
-            return expr
-            
-        elif token.type == TokenTypes.LPAREN:
-            self.eat(TokenTypes.LPAREN)
-            expr = self.parse_expression()
-            self.eat(TokenTypes.RPAREN)
-            return expr
-            
-        self.error(f"Unexpected token {token.type.name}")
+    def parse_identifier(self) -> Identifier:
+        """Parse an identifier reference"""
+        location = self.get_location()
+        return self.make(Identifier, location, self.eat(TokenTypes.IDENT).value)
+
+    def parse_group(self) -> Expression:
+        """Parse a parenthesized expression"""
+        self.eat(TokenTypes.LPAREN)
+        expr = self.parse_expression()
+        self.eat(TokenTypes.RPAREN)
+        return expr
+
+    def parse_unary(self) -> UnaryOp:
+        """Parse a prefix operator applied to an operand (-x, !x)"""
+        location = self.get_location()
+        operator = self.eat().type
+        operand = self.parse_expression(self.UNARY_PRECEDENCE)
+        return self.make(UnaryOp, location, operator, operand)
+
+    def parse_member_access(self, obj: Expression, location: Any) -> MemberAccess:
+        """Parse '.member' after an expression"""
+        self.eat(TokenTypes.DOT)
+
+        if self.current_token.type != TokenTypes.IDENT:
+            self.error("Expected identifier after '.'", 'expected-name')
+
+        return self.make(MemberAccess, location, obj, self.parse_identifier())
 
     def parse_function_call(self, func_expr, location: Any) -> FunctionCall:
         """Parse a function call with arguments"""
         # For simple name function calls, convert to Identifier
         if isinstance(func_expr, str):
-            func_expr = Identifier(name=func_expr, location=location)
-            
+            func_expr = self.make(Identifier, location, func_expr)
+
         self.eat(TokenTypes.LPAREN)
         args = []
-        
+
         # Handle empty argument list
         if self.current_token.type == TokenTypes.RPAREN:
             self.eat(TokenTypes.RPAREN)
-            return FunctionCall(
-                function=func_expr,
-                arguments=args,
-                location=location
-            )
-            
+            return self.make(FunctionCall, location, func_expr, args)
+
         # Parse first argument
         args.append(self.parse_expression())
-        
+
         # Parse remaining arguments
         while self.current_token.type == TokenTypes.COMMA:
             self.eat(TokenTypes.COMMA)
             args.append(self.parse_expression())
-                
+
         self.eat(TokenTypes.RPAREN)
-        return FunctionCall(
-            function=func_expr,
-            arguments=args,
-            location=location
-        )
+        return self.make(FunctionCall, location, func_expr, args)
 
+    @memoize
     def parse_expression(self, precedence: int = 0) -> Expression:
-        """Parse an expression using operator precedence"""
-        left = self.parse_primary_expression()
-        
-        while (self.current_token.type in self.PRECEDENCE and 
-               self.PRECEDENCE[self.current_token.type] > precedence):
-            
-            operator = self.current_token.type
-            op_precedence = self.PRECEDENCE[operator]
-            location = self.get_location()
-            self.eat(operator)
-            
-            right = self.parse_expression(op_precedence)
-            left = BinaryOp(
-                left=left,
-                operator=operator,
-                right=right,
-                location=location
-            )
-            
-        return left 
\ No newline at end of file
+        """Parse an expression whose operators bind tighter than precedence"""
+        if self.iterative_expressions:
+            return self.parse_expression_iterative(precedence)
+
+        prefix = self.prefix_table[self.current_token.type._value_]
+        if prefix is None:
+            self.error(f"Unexpected token {self.current_token.type.name}", 'unexpected-token')
+        left = prefix()
+
+        postfix_table = self.postfix_table
+        precedence_table = self.precedence_table
+        while True:
+            kind = self.current_token.type
+            postfix = postfix_table[kind._value_]
+            if postfix is not None:
+                # Postfix operators bind tightest; the chain keeps the
+                # location of the operand it started from
+                left = postfix(left, self.location_of(left))
+                continue
+
+            op_precedence = precedence_table[kind._value_]
+            if op_precedence <= precedence:
+                return left
+
+            operator_location = self.get_location()
+            self.eat(kind)
+            if kind in self.RIGHT_ASSOCIATIVE:
+                right = self.parse_expression(op_precedence - 1)
+            else:
+                right = self.parse_expression(op_precedence)
+            left = self.make(BinaryOp, operator_location, left, kind, right)
+
+    def parse_expression_iterative(self, precedence: int = 0) -> Expression:
+        """Parse an expression without recursion (shunting-yard).
+
+        Builds the same trees as parse_expression. Pending operators live on
+        an explicit stack, separated by a frame for every open '(' group or
+        call argument list, so memory grows with nesting depth and Python's
+        recursion limit never comes into play.
+        """
+        operands = []
+        # Entries are (kind, ...) tuples:
+        #   ('binary', operator, precedence, location)
+        #   ('unary', operator, location)
+        #   ('group',)
+        #   ('call', function, arguments, location)
+        operators = []
+        open_frames = 0
+        precedence_table = self.precedence_table
+
+        def reduce(threshold: int):
+            # Apply pending operators of the innermost frame that bind at
+            # least as tightly as an incoming operator of this precedence
+            while operators:
+                entry = operators[-1]
+                if entry[0] == 'binary':
+                    operator, op_precedence = entry[1], entry[2]
+                    stop = op_precedence - 1 if operator in self.RIGHT_ASSOCIATIVE else op_precedence
+                    if threshold > stop:
+                        return
+                    operators.pop()
+                    right = operands.pop()
+                    left = operands.pop()
+                    operands.append(self.make(BinaryOp, entry[3], left, operator, right))
+                elif entry[0] == 'unary':
+                    if threshold > self.UNARY_PRECEDENCE:
+                        return
+                    operators.pop()
+                    operands.append(self.make(UnaryOp, entry[2], entry[1], operands.pop()))
+                else:
+                    return
+
+        expect_operand = True
+        while True:
+            token = self.current_token
+            kind = token.type
+
+            if expect_operand:
+                if kind in self.LITERAL_TYPES:
+                    operands.append(self.parse_literal())
+                    expect_operand = False
+                elif kind == TokenTypes.IDENT:
+                    operands.append(self.parse_identifier())
+                    expect_operand = False
+                elif kind in (TokenTypes.MINUS, TokenTypes.NOT):
+                    operators.append(('unary', kind, self.get_location()))
+                    self.eat(kind)
+                elif kind == TokenTypes.LPAREN:
+                    operators.append(('group',))
+                    open_frames += 1
+                    self.eat(TokenTypes.LPAREN)
+                else:
+                    self.error(f"Unexpected token {kind.name}", 'unexpected-token')
+                continue
+
+            if kind == TokenTypes.DOT:
+                obj = operands.pop()
+                operands.append(self.parse_member_access(obj, self.location_of(obj)))
+
+            elif kind == TokenTypes.LPAREN:
+                function = operands.pop()
+                self.eat(TokenTypes.LPAREN)
+                if self.current_token.type == TokenTypes.RPAREN:
+                    self.eat(TokenTypes.RPAREN)
+                    operands.append(self.make(FunctionCall, self.location_of(function), function, []))
+                else:
+                    operators.append(('call', function, [], self.location_of(function)))
+                    open_frames += 1
+                    expect_operand = True
+
+            elif kind == TokenTypes.COMMA and open_frames:
+                reduce(0)
+                frame = operators[-1]
+                if frame[0] == 'group':
+                    # A comma inside a parenthesized group
+                    self.eat(TokenTypes.RPAREN)
+                frame[2].append(operands.pop())
+                self.eat(TokenTypes.COMMA)
+                expect_operand = True
+
+            elif kind == TokenTypes.RPAREN and open_frames:
+                reduce(0)
+                frame = operators.pop()
+                open_frames -= 1
+                self.eat(TokenTypes.RPAREN)
+                if frame[0] == 'call':
+                    frame[2].append(operands.pop())
+                    operands.append(self.make(FunctionCall, frame[3], frame[1], frame[2]))
+
+            elif precedence_table[kind._value_] and (open_frames or precedence_table[kind._value_] > precedence):
+                op_precedence = precedence_table[kind._value_]
+                reduce(op_precedence)
+                operators.append(('binary', kind, op_precedence, self.get_location()))
+                self.eat(kind)
+                expect_operand = True
+
+            else:
+                break
+
+        if open_frames:
+            # Same error the recursive parser reports for an unclosed group
+            self.eat(TokenTypes.RPAREN)
+        reduce(0)
+        return operands.pop()
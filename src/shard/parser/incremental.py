@@ -0,0 +1,300 @@
+from bisect import bisect_right
+from typing import List, Optional, Tuple
+
+from .parser import Parser
+from ..ast_nodes import Node, Program, Declaration, FunctionDef, ObjectDef, ImplDef
+from ..lexer.lexer import Lexer
+from ..lexer.token_stream import TokenStream
+from ..lexer.tokens import TokenTypes
+
+
+class _SpanParser(Parser):
+    """Parser that records the token span of every item of a top-level block.
+
+    A top-level declaration has at most one block of its own (the members of
+    a type, shard or impl, or the body of a function); the items of that
+    block are the units below declarations that can be reparsed alone.
+
+    In region mode the parser only reads part of the stream, so brackets are
+    not paired up front: matching_bracket scans forward from the opener.
+    """
+
+    def __init__(self, stream: TokenStream, region: bool = False, **options):
+        self.region = region
+        self.block_depth = 0
+        self.blocks = 0
+        self.item_spans: List[Tuple[int, int]] = []
+        super().__init__(stream, **options)
+
+    def _index_stream_brackets(self):
+        if not self.region:
+            super()._index_stream_brackets()
+
+    def matching_bracket(self, index: int) -> int:
+        if not self.region or index in self.bracket_matches:
+            return super().matching_bracket(index)
+        kinds = self.token_buffer.kinds
+        openers = (TokenTypes.LPAREN.value, TokenTypes.LBRACE.value)
+        closers = (TokenTypes.RPAREN.value, TokenTypes.RBRACE.value)
+        depth = 0
+        for position in range(index, len(kinds)):
+            kind = kinds[position]
+            if kind in openers:
+                depth += 1
+            elif kind in closers:
+                depth -= 1
+                if depth == 0:
+                    self.bracket_matches[index] = position
+                    return position
+        return len(kinds) - 1
+
+    def parse_block(self):
+        self.block_depth += 1
+        if self.block_depth == 1:
+            self.blocks += 1
+        try:
+            return super().parse_block()
+        finally:
+            self.block_depth -= 1
+
+    def parse_block_item(self) -> Node:
+        start = self.current_pos
+        item = super().parse_block_item()
+        if self.block_depth == 1:
+            self.item_spans.append((start, self.current_pos))
+        return item
+
+    def parse_spanned_declaration(self) -> Tuple[Declaration, '_DeclarationSpan']:
+        """Parse one top-level declaration and record its spans"""
+        start = self.current_pos
+        self.blocks = 0
+        self.item_spans = []
+        declaration = self.parse_declaration()
+        items = [(item_start - start, item_end - start) for item_start, item_end in self.item_spans]
+        if self.blocks != 1 or _block_items(declaration) is None:
+            items = []
+        return declaration, _DeclarationSpan(start, self.current_pos, items)
+
+
+class _DeclarationSpan:
+    """Token span [start, end) of a top-level declaration.
+
+    Item spans are relative to start, so only the top-level spans need to
+    move when an edit earlier in the file changes the token count.
+    """
+
+    __slots__ = ('start', 'end', 'items')
+
+    def __init__(self, start: int, end: int, items: List[Tuple[int, int]]):
+        self.start = start
+        self.end = end
+        self.items = items
+
+
+def _block_items(declaration: Declaration) -> Optional[List[Node]]:
+    """Return the list holding the items of a declaration's own block"""
+    if isinstance(declaration, (ObjectDef, ImplDef)):
+        return declaration.members
+    if isinstance(declaration, FunctionDef):
+        return declaration.body
+    return None
+
+
+def _contains(start: int, end: int, index: int, old_count: int) -> bool:
+    """Whether the old tokens [index, index + old_count) lie inside [start, end).
+
+    Tokens inserted between two old tokens (old_count 0) only belong to a
+    span when they are strictly inside it; at its edge they could just as
+    well extend the neighbouring declaration.
+    """
+    if old_count:
+        return start <= index and index + old_count <= end
+    return start < index < end
+
+
+def shift_locations(nodes: List[Node], delta: int, lines, since: int = 0) -> None:
+    """Move the locations of nodes and their descendants by delta offsets.
+
+    Only locations starting at or after the offset since are moved. They
+    are updated in place; a location shared between nodes (a postfix chain
+    reuses the location of its head) is moved once.
+    """
+    moved = set()
+    stack = list(nodes)
+    pop, append, extend = stack.pop, stack.append, stack.extend
+    while stack:
+        node = pop()
+        location = node.location
+        if location is not None and location.start >= since and id(location) not in moved:
+            moved.add(id(location))
+            location.start += delta
+            location.end += delta
+            location.lines = lines
+        for name in node.CHILD_FIELDS:
+            child = getattr(node, name)
+            if type(child) is list:
+                extend(child)
+            elif child is not None:
+                append(child)
+
+
+class IncrementalParser:
+    """Keeps a Program up to date while its source text is edited.
+
+    The first parse records the token span of every top-level declaration
+    and of every item (member or statement) in a top-level block. After an
+    edit the TokenStream is re-lexed in place (TokenStream.apply_edit) and
+    only the smallest recorded span containing the changed tokens is parsed
+    again: one block item if the edit stays inside one, otherwise its
+    top-level declaration. All other subtrees are reused; those after the
+    edit get their locations shifted in place, a walk over the rest of the
+    tree that is the only remaining cost proportional to the file size.
+
+    A reparse is accepted only if it ends exactly where the old subtree
+    ended (adjusted for the token count change). Anything else, such as an
+    edit between declarations or one that unbalances a brace, falls back to
+    a full reparse, so the result is always what parsing the new text from
+    scratch would give.
+
+    The Program is updated in place and returned by parse() and edit().
+    options are passed to every parser except hash_cons, which is rejected:
+    shared nodes keep their locations in the factory's side table, which
+    shifting reused subtrees after an edit would leave stale.
+    """
+
+    def __init__(self, text: str, filename: str = '<unknown>', **options):
+        if options.get('hash_cons'):
+            raise ValueError("IncrementalParser does not support hash_cons")
+        self.filename = filename
+        self.options = options
+        self._text = text
+        # None while the text does not lex (an unterminated string, say)
+        self.stream: Optional[TokenStream] = None
+        self.program: Optional[Program] = None
+        self.spans: List[_DeclarationSpan] = []
+        # Number of declarations and block items parsed again by the last edit
+        self.reparsed = 0
+
+    @property
+    def text(self) -> str:
+        return self._text
+
+    def parse(self) -> Program:
+        """Parse the whole text, recording declaration and item spans"""
+        self.program = None
+        if self.stream is None:
+            self.stream = TokenStream.from_lexer(Lexer(self._text, self.filename))
+        parser = _SpanParser(self.stream, **self.options)
+        parser.prescan()
+        declarations = []
+        spans = []
+        while parser.current_token.type != TokenTypes.EOF:
+            declaration, span = parser.parse_spanned_declaration()
+            declarations.append(declaration)
+            spans.append(span)
+        self.spans = spans
+        self.program = Program(declarations=declarations)
+        self.reparsed = len(declarations)
+        return self.program
+
+    def edit(self, offset: int, removed: int, inserted: str) -> Program:
+        """Replace removed characters at offset by inserted and update the Program.
+
+        Raises SyntaxError if the new text does not parse; the next edit
+        then starts over with a full parse.
+        """
+        if self.stream is None:
+            self._text = self._text[:offset] + inserted + self._text[offset + removed:]
+            return self.parse()
+        try:
+            index, old_count, new_count = self.stream.apply_edit(offset, removed, inserted)
+        except SyntaxError:
+            self._text = self._text[:offset] + inserted + self._text[offset + removed:]
+            self.stream = self.program = None
+            raise
+        # The stream's line table holds the edited text already
+        self._text = self.stream.lines.text
+        if self.program is None:
+            return self.parse()
+        try:
+            if self._reparse(offset, index, old_count, new_count, len(inserted) - removed):
+                return self.program
+        except SyntaxError:
+            # The error may lie outside the reparsed region's view (or the
+            # region was a bad guess); the full parse reports it properly
+            pass
+        return self.parse()
+
+    def _reparse(self, offset: int, index: int, old_count: int, new_count: int, delta: int) -> bool:
+        """Reparse the span containing the edit; False if a full parse is needed"""
+        spans = self.spans
+        declarations = self.program.declarations
+        token_delta = new_count - old_count
+        lines = self.stream.lines
+
+        starts = [span.start for span in spans]
+        if old_count == 0 and new_count == 0:
+            # Only trivia changed: the tree is the same, shifted from the
+            # edit on (which may be in the middle of a declaration)
+            position = bisect_right(starts, index)
+            if position and spans[position - 1].start == index:
+                position -= 1
+            elif position and index < spans[position - 1].end:
+                shift_locations([declarations[position - 1]], delta, lines, since=offset)
+            self._shift_after(position, token_delta, delta)
+            self.reparsed = 0
+            return True
+
+        position = bisect_right(starts, index) - 1
+        if position < 0:
+            return False
+        span = spans[position]
+        if not _contains(span.start, span.end, index, old_count):
+            return False
+        declaration = declarations[position]
+
+        # Smallest unit: one item of the declaration's block
+        relative = index - span.start
+        for item_position, (item_start, item_end) in enumerate(span.items):
+            if not _contains(item_start, item_end, relative, old_count):
+                continue
+            parser = _SpanParser(self.stream, region=True, **self.options)
+            parser.block_depth = 1
+            parser.reset(span.start + item_start)
+            item = parser.parse_block_item()
+            new_end = item_end + token_delta
+            if parser.current_pos != span.start + new_end:
+                return False
+            items = _block_items(declaration)
+            items[item_position] = item
+            span.items[item_position] = (item_start, new_end)
+            later = span.items[item_position + 1:]
+            span.items[item_position + 1:] = [(start + token_delta, end + token_delta) for start, end in later]
+            span.end += token_delta
+            shift_locations(items[item_position + 1:], delta, lines)
+            self._shift_after(position + 1, token_delta, delta)
+            self.reparsed = 1
+            return True
+
+        # Otherwise the whole declaration
+        parser = _SpanParser(self.stream, region=True, **self.options)
+        parser.reset(span.start)
+        new_declaration, new_span = parser.parse_spanned_declaration()
+        if new_span.end != span.end + token_delta:
+            return False
+        declarations[position] = new_declaration
+        spans[position] = new_span
+        self._shift_after(position + 1, token_delta, delta)
+        self.reparsed = 1
+        return True
+
+    def _shift_after(self, position: int, token_delta: int, delta: int):
+        """Move the declarations from position on past the edit.
+
+        Their locations are also pointed at the new line table, since the
+        edit may have added or removed lines even if delta is 0.
+        """
+        for span in self.spans[position:]:
+            span.start += token_delta
+            span.end += token_delta
+        shift_locations(self.program.declarations[position:], delta, self.stream.lines)
@@ -0,0 +1,145 @@
+import itertools
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple, Union
+
+from .parser import Parser
+from .incremental import shift_locations
+from ..ast_nodes import Declaration, Program
+from ..lexer.lexer import Lexer
+from ..lexer.line_table import LineTable
+
+# Everything that can hide a bracket or semicolon from the pre-scan, and the
+# tokens it counts; mirrors the lexer's comment and string rules
+PRESCAN_PATTERN = r'''
+    "(?:[^"\\\n]|\\[\s\S])*"
+  | //[^\n]*
+  | /\*[\s\S]*?(?:\*/|\Z)
+  | (?P<BRACKET>[(){};])
+'''
+PRESCAN_RE = re.compile(PRESCAN_PATTERN, re.VERBOSE)
+BYTES_PRESCAN_RE = re.compile(PRESCAN_PATTERN.encode(), re.VERBOSE)
+
+# Line tables of the files being parsed, for results coming back from workers
+_LINE_TABLES: Dict[int, LineTable] = {}
+_LINE_TABLE_KEYS = itertools.count()
+
+
+def _line_table(key: int) -> LineTable:
+    return _LINE_TABLES[key]
+
+
+class _SharedLineTable(LineTable):
+    """Line table of one chunk that unpickles as the whole file's table.
+
+    Locations parsed in a worker refer to it, so sending them back costs a
+    key instead of a copy of the chunk text.
+    """
+
+    __slots__ = ('key',)
+
+    def __init__(self, text, file: str, key: int):
+        super().__init__(text, file)
+        self.key = key
+
+    def __reduce__(self):
+        return _line_table, (self.key,)
+
+
+def declaration_boundaries(text: Union[str, bytes]) -> Optional[List[int]]:
+    """Find the end offset of every top-level declaration.
+
+    A declaration ends with a ';' or '}' that brings the bracket depth back
+    to 0. Returns None for unbalanced brackets; the serial parser then
+    reports them.
+    """
+    if isinstance(text, str):
+        prescan_re, openers, semicolon, closing_brace = PRESCAN_RE, ('(', '{'), ';', '}'
+    else:
+        prescan_re, openers, semicolon, closing_brace = BYTES_PRESCAN_RE, (b'(', b'{'), b';', b'}'
+    boundaries = []
+    depth = 0
+    for match in prescan_re.finditer(text):
+        bracket = match.group('BRACKET')
+        if bracket is None:
+            continue
+        if bracket in openers:
+            depth += 1
+        elif bracket == semicolon:
+            if depth == 0:
+                boundaries.append(match.end())
+        else:
+            depth -= 1
+            if depth < 0:
+                return None
+            if depth == 0 and bracket == closing_brace:
+                boundaries.append(match.end())
+    return boundaries if depth == 0 else None
+
+
+def _chunks(text: Union[str, bytes], boundaries: List[int], chunk_size: int) -> List[Tuple[int, int]]:
+    """Group consecutive declarations into (start, end) ranges of at least chunk_size"""
+    chunks = []
+    start = 0
+    for end in boundaries:
+        if end - start >= chunk_size:
+            chunks.append((start, end))
+            start = end
+    if start < len(text):
+        chunks.append((start, len(text)))
+    return chunks
+
+
+def _parse_chunk(chunk: Union[str, bytes], base: int, filename: str, key: int,
+                 options: dict) -> Optional[List[Declaration]]:
+    """Parse the declarations of one chunk, with locations in the whole file.
+
+    Returns None on a syntax error: its message would be relative to the
+    chunk, so the caller reparses serially to report it.
+    """
+    lexer = Lexer(chunk, filename)
+    lexer.lines = _SharedLineTable(chunk, filename, key)
+    try:
+        program = Parser(lexer, **options).parse()
+    except SyntaxError:
+        return None
+    shift_locations(program.declarations, base, lexer.lines)
+    return program.declarations
+
+
+def parse_parallel(text: Union[str, bytes], filename: str = '<unknown>', workers: Optional[int] = None,
+                   chunk_size: int = 1 << 18, **options) -> Program:
+    """Parse a program with its top-level declarations spread over processes.
+
+    Declarations are independent, so a brace-depth pre-scan of the text
+    splits it into chunks of whole declarations (at least chunk_size
+    characters each), which a ProcessPoolExecutor parses with the ordinary
+    Parser. Results are stitched in file order and their locations point
+    into the whole text, so the Program equals what Parser would build.
+    Input with unbalanced brackets, a syntax error anywhere, or just one
+    chunk is parsed serially in this process instead.
+    """
+    boundaries = declaration_boundaries(text)
+    chunks = _chunks(text, boundaries, chunk_size) if boundaries is not None else []
+    if len(chunks) < 2 or workers == 1:
+        return Parser(Lexer(text, filename), **options).parse()
+
+    key = next(_LINE_TABLE_KEYS)
+    _LINE_TABLES[key] = LineTable(text, filename)
+    try:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+            results = list(executor.map(
+                _parse_chunk,
+                [text[start:end] for start, end in chunks],
+                [start for start, end in chunks],
+                itertools.repeat(filename),
+                itertools.repeat(key),
+                itertools.repeat(options),
+            ))
+    finally:
+        del _LINE_TABLES[key]
+
+    if any(result is None for result in results):
+        return Parser(Lexer(text, filename), **options).parse()
+    return Program(declarations=[declaration for result in results for declaration in result])
@@ -1,5 +1,6 @@
-from typing import List, Optional, Any
+from typing import Iterator, List, Optional, Any, Tuple
 from .declaration_parser import DeclarationParser
+from .base_parser import ParseError
 from ..ast_nodes import (
     Program, Declaration, TypeDef, ShardDef, ImplDef, 
     FunctionDef, VariableDef, ComponentInstantiation, Expression,
@@ -10,12 +11,15 @@ from ..lexer.tokens import TokenTypes
 class Parser(DeclarationParser):
     """Main parser class for Shard language"""
 
+    # Keywords that always start a new top-level declaration
+    DECLARATION_KEYWORDS = {TokenTypes.TYPE, TokenTypes.SHARD, TokenTypes.IMPL}
+
     def parse_top_level_parameter(self) -> Parameter:
         """Parse parameter declaration at top level"""
         location = self.get_location()
         
         if self.current_token.type != TokenTypes.IDENT:
-            self.error("Expected parameter name")
+            self.error("Expected parameter name", 'expected-name')
             
         name = self.current_token.value
         self.eat(TokenTypes.IDENT)
@@ -45,7 +49,7 @@ class Parser(DeclarationParser):
         location = self.get_location()
         
         if self.current_token.type != TokenTypes.IDENT:
-            self.error("Expected function name")
+            self.error("Expected function name", 'expected-name')
             
         name = self.current_token.value
         self.eat(TokenTypes.IDENT)
@@ -73,7 +77,7 @@ class Parser(DeclarationParser):
         # Parse function body if present
         body = None
         if self.current_token.type == TokenTypes.LBRACE:
-            body = self.parse_block()
+            body = self.parse_function_body()
         else:
             self.expect_semicolon()
             
@@ -91,105 +95,145 @@ class Parser(DeclarationParser):
         declarations = []
         
         while self.current_token.type != TokenTypes.EOF:
-            # Parse modifiers (pub, priv, etc.)
-            modifiers = self.parse_modifiers()
-            
-            # Parse type definitions
-            if self.current_token.type == TokenTypes.TYPE:
-                declarations.append(self.parse_type_definition(modifiers))
-                
-            # Parse shard definitions
-            elif self.current_token.type == TokenTypes.SHARD:
-                declarations.append(self.parse_shard_definition(modifiers))
-                
-            # Parse impl blocks
-            elif self.current_token.type == TokenTypes.IMPL:
-                declarations.append(self.parse_impl_definition())
+            declarations.append(self.parse_declaration())
                 
-            # Parse top-level functions or component instantiations
-            elif self.current_token.type == TokenTypes.IDENT:
-                ident_value = self.current_token.value
+        return declarations
+
+    def iter_declarations(self) -> Iterator[Declaration]:
+        """Yield top-level declarations one at a time, as they are parsed.
+
+        The tokens of each declaration are discarded before it is yielded,
+        so with a lazily lexing input (a StreamingLexer in particular) the
+        memory in use stays bounded by the largest declaration, however
+        long the program. Skeleton mode keeps the tokens for its deferred
+        bodies. Unbalanced brackets are only found when they are reached.
+        """
+        while self.current_token.type != TokenTypes.EOF:
+            declaration = self.parse_declaration()
+            if not self.skeleton:
+                self.discard_consumed_tokens()
+            yield declaration
+
+    def parse_declaration(self) -> Declaration:
+        """Parse one top-level declaration"""
+        # Parse modifiers (pub, priv, etc.)
+        modifiers = self.parse_modifiers()
+        
+        # Parse type definitions
+        if self.current_token.type == TokenTypes.TYPE:
+            return self.parse_type_definition(modifiers)
+            
+        # Parse shard definitions
+        if self.current_token.type == TokenTypes.SHARD:
+            return self.parse_shard_definition(modifiers)
+            
+        # Parse impl blocks
+        if self.current_token.type == TokenTypes.IMPL:
+            return self.parse_impl_definition()
+            
+        # Parse top-level functions or component instantiations
+        if self.current_token.type == TokenTypes.IDENT:
+            ident_value = self.current_token.value
+            
+            # Look ahead to check if it's a function
+            if self.peek().type != TokenTypes.LPAREN:
+                # Parse as a variable declaration
+                return self.parse_variable(modifiers)
                 
-                # Look ahead to check if it's a function
-                if self.peek().type == TokenTypes.LPAREN:
-                    saved_pos = self.lexer.pos
-                    saved_line = self.lexer.line
-                    saved_column = self.lexer.column
-                    saved_token = self.current_token
-                    
-                    # Check if this is a function call with "as" (component instantiation)
-                    self.eat(TokenTypes.IDENT)
-                    self.eat(TokenTypes.LPAREN)
-                    
-                    # Skip arguments
-                    param_depth = 1  # Track nested parentheses
-                    while param_depth > 0 and self.current_token.type != TokenTypes.EOF:
-                        if self.current_token.type == TokenTypes.LPAREN:
-                            param_depth += 1
-                        elif self.current_token.type == TokenTypes.RPAREN:
-                            param_depth -= 1
-                        
-                        if param_depth > 0:
-                            self.eat(self.current_token.type)
-                    
-                    # At this point we've found the closing parenthesis
-                    self.eat(TokenTypes.RPAREN)
-                    
-                    is_component = self.current_token.type == TokenTypes.AS
-                    
-                    # Restore lexer state
-                    self.lexer.pos = saved_pos
-                    self.lexer.line = saved_line
-                    self.lexer.column = saved_column
-                    self.current_token = saved_token
-                    
-                    if is_component:
-                        # Parse component instantiation
-                        location = self.get_location()
-                        self.eat(TokenTypes.IDENT)  # Component type
-                        
-                        # Parse arguments
-                        self.eat(TokenTypes.LPAREN)
-                        args = []
-                        if self.current_token.type != TokenTypes.RPAREN:
-                            args.append(self.parse_expression())
-                            while self.current_token.type == TokenTypes.COMMA:
-                                self.eat(TokenTypes.COMMA)
-                                args.append(self.parse_expression())
-                        self.eat(TokenTypes.RPAREN)
-                        
-                        # Parse instance name
-                        self.eat(TokenTypes.AS)
-                        if self.current_token.type != TokenTypes.IDENT:
-                            self.error("Expected instance name after 'as'")
-                        
-                        instance_name = self.current_token.value
-                        self.eat(TokenTypes.IDENT)
-                        
-                        comp = ComponentInstantiation(
-                            component_type=ident_value,
-                            instance_name=instance_name,
-                            args=args,
-                            location=location
-                        )
-                        self.expect_semicolon()
-                        declarations.append(comp)
-                    else:
-                        # Parse function declaration
-                        declarations.append(self.parse_top_level_function(modifiers))
-                else:
-                    # Parse as a variable declaration
-                    declarations.append(self.parse_variable(modifiers))
-            # Parse string literals (function names, etc)
-            elif self.current_token.type == TokenTypes.STRING:
-                # This is likely a function with a string literal name
-                declarations.append(self.parse_function_header(modifiers))
-            else:
-                self.error(f"Unexpected token {self.current_token.type.name} at top level")
+            # A component instantiation is a call followed by "as"
+            closing = self.matching_bracket(self.current_pos + 1)
+            if self.token_at(closing + 1).type != TokenTypes.AS:
+                # Parse function declaration
+                return self.parse_top_level_function(modifiers)
                 
-        return declarations
+            # Parse component instantiation
+            location = self.get_location()
+            self.eat(TokenTypes.IDENT)  # Component type
+            
+            # Parse arguments
+            self.eat(TokenTypes.LPAREN)
+            args = []
+            if self.current_token.type != TokenTypes.RPAREN:
+                args.append(self.parse_expression())
+                while self.current_token.type == TokenTypes.COMMA:
+                    self.eat(TokenTypes.COMMA)
+                    args.append(self.parse_expression())
+            self.eat(TokenTypes.RPAREN)
+            
+            # Parse instance name
+            self.eat(TokenTypes.AS)
+            if self.current_token.type != TokenTypes.IDENT:
+                self.error("Expected instance name after 'as'", 'expected-name')
+            
+            instance_name = self.current_token.value
+            self.eat(TokenTypes.IDENT)
+            
+            comp = ComponentInstantiation(
+                component_type=ident_value,
+                instance_name=instance_name,
+                args=args,
+                location=location
+            )
+            self.expect_semicolon()
+            return comp
+            
+        # Parse string literals (function names, etc)
+        if self.current_token.type == TokenTypes.STRING:
+            # This is likely a function with a string literal name
+            return self.parse_function_header(modifiers)
+            
+        self.error(f"Unexpected token {self.current_token.type.name} at top level", 'unexpected-token')
 
     def parse(self) -> Program:
         """Parse a Shard program"""
+        self.prescan()
         declarations = self.parse_declarations()
         return Program(declarations=declarations) 
+
+    def parse_with_recovery(self) -> Tuple[Program, List[SyntaxError]]:
+        """Parse a program, collecting every syntax error instead of stopping at the first.
+
+        After an error in a block, parsing resumes after the block's next
+        ';' or at its closing '}'. After an error elsewhere in a top-level
+        declaration it resumes after the ';' or '{...}' group that ends the
+        declaration, or at the next type, shard or impl. The Program holds
+        everything that did parse.
+
+        Text the lexer rejects and unbalanced brackets are reported by the
+        pre-scan: stray closing brackets are then skipped, a closer of an
+        outer bracket also closes the brackets opened since, and brackets
+        still open close at the end of input. Errors come in source order,
+        one per position.
+        """
+        self.recovering = True
+        self.errors = []
+        declarations = []
+        try:
+            self.prescan()
+            self.skip_stray_brackets()
+            while self.current_token.type != TokenTypes.EOF:
+                try:
+                    declarations.append(self.parse_declaration())
+                except ParseError as error:
+                    self.record_error(error)
+                    self.skip_declaration()
+        finally:
+            self.recovering = False
+        self.errors.sort(key=lambda error: error.start)
+        return Program(declarations=declarations), self.errors
+
+    def skip_declaration(self):
+        """Skip the rest of a top-level declaration that failed to parse"""
+        start = self.current_pos
+        while self.current_token.type != TokenTypes.EOF:
+            kind = self.current_token.type
+            if kind in self.DECLARATION_KEYWORDS and self.current_pos > start:
+                return
+            if kind in self.OPENING_BRACKETS:
+                self.reset(self.matching_bracket(self.current_pos) + 1)
+                if kind == TokenTypes.LBRACE:
+                    return
+                continue
+            self.eat()
+            if kind in (TokenTypes.SEMICOLON, TokenTypes.RBRACE):
+                return
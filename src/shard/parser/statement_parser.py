@@ -1,10 +1,12 @@
+import functools
 from typing import List, Optional, Set, Union
 from .expression_parser import ExpressionParser
+from .base_parser import memoize, ParseError
 from ..lexer import TokenTypes
 from ..ast_nodes import (
     Statement, ExpressionStatement, ReturnStatement,
     VariableDef, If, While, ComponentInstantiation, Node, FunctionDef, Expression,
-    Literal, Identifier, FunctionCall, Parameter
+    Literal, Identifier, FunctionCall, Parameter, Deferred
 )
 from ..ast_nodes.declarations import *
 
@@ -23,10 +25,16 @@ class StatementParser(ExpressionParser):
         TokenTypes.META, TokenTypes.BUS, TokenTypes.ON,
     }
 
+    def __init__(self, lexer, *args, skeleton: bool = False, **kwargs):
+        super().__init__(lexer, *args, **kwargs)
+        # Skeleton mode: function bodies are skipped over and only parsed
+        # when FunctionDef.body is first read
+        self.skeleton = skeleton
+
     def parse_type(self) -> str:
         """Parse a type identifier"""
         if self.current_token.type not in {TokenTypes.IDENT, TokenTypes.STRING}:
-            self.error("Expected type identifier or string literal")
+            self.error("Expected type identifier or string literal", 'expected-name')
         type_name = self.current_token.value
         self.eat(self.current_token.type)
         return type_name
@@ -37,7 +45,7 @@ class StatementParser(ExpressionParser):
         modifiers = self.parse_modifiers()
         
         if self.current_token.type != TokenTypes.IDENT:
-            self.error("Expected parameter name")
+            self.error("Expected parameter name", 'expected-name')
             
         name = self.current_token.value
         self.eat(TokenTypes.IDENT)
@@ -88,12 +96,13 @@ class StatementParser(ExpressionParser):
         self.eat(TokenTypes.RPAREN)
         return params
 
+    @memoize
     def parse_function_header(self, modifiers: List[TokenTypes]) -> FunctionDef:
         """Parse a function declaration header"""
         location = self.get_location()
         
         if self.current_token.type not in {TokenTypes.IDENT, TokenTypes.STRING}:
-            self.error(f"Expected function name or string literal")
+            self.error(f"Expected function name or string literal", 'expected-name')
             
         name = self.current_token.value
         self.eat(self.current_token.type)
@@ -116,7 +125,7 @@ class StatementParser(ExpressionParser):
         # Parse optional body
         body = None
         if self.current_token.type == TokenTypes.LBRACE:
-            body = self.parse_block()
+            body = self.parse_function_body()
         else:
             self.expect_semicolon()
 
@@ -146,12 +155,13 @@ class StatementParser(ExpressionParser):
 
         return modifiers
 
+    @memoize
     def parse_variable(self, modifiers: List[TokenTypes]) -> VariableDef:
         """Parse a variable declaration"""
         location = self.get_location()
         
         if self.current_token.type not in {TokenTypes.IDENT, TokenTypes.STRING}:
-            self.error("Expected identifier or string literal")
+            self.error("Expected identifier or string literal", 'expected-name')
             
         name = self.current_token.value
         self.eat(self.current_token.type)
@@ -260,7 +270,7 @@ class StatementParser(ExpressionParser):
                 self.eat(TokenTypes.AS)
                 
                 if self.current_token.type != TokenTypes.IDENT:
-                    self.error("Expected instance name after 'as'")
+                    self.error("Expected instance name after 'as'", 'expected-name')
                     
                 instance_name = self.current_token.value
                 self.eat(TokenTypes.IDENT)
@@ -276,12 +286,8 @@ class StatementParser(ExpressionParser):
                 return comp
             else:
                 # Create a function call expression
-                ident = Identifier(name=ident_value, location=location)
-                func_call = FunctionCall(
-                    function=ident,
-                    arguments=args,
-                    location=location
-                )
+                ident = self.make(Identifier, location, ident_value)
+                func_call = self.make(FunctionCall, location, ident, args)
                 # Wrap in ExpressionStatement
                 stmt = ExpressionStatement(expr=func_call, location=location)
                 self.expect_semicolon()
@@ -292,7 +298,7 @@ class StatementParser(ExpressionParser):
             location = self.get_location()
             value = self.current_token.value
             self.eat(TokenTypes.STRING)
-            expr = Literal(value=value, literal_type=TokenTypes.STRING, location=location)
+            expr = self.make(Literal, location, value, TokenTypes.STRING)
             self.expect_semicolon()
             return ExpressionStatement(expr=expr, location=location)
             
@@ -310,198 +316,180 @@ class StatementParser(ExpressionParser):
         
         while self.current_token.type != TokenTypes.RBRACE:
             if self.current_token.type == TokenTypes.EOF:
-                self.error("Unexpected end of file inside block")
-                
-            # First, try to parse it as a statement (expressions, return, if, while, etc.)
-            if self.current_token.type in {TokenTypes.RETURN, TokenTypes.IF, TokenTypes.WHILE, 
-                                         TokenTypes.STRING, TokenTypes.INTEGER, TokenTypes.FLOAT, 
-                                         TokenTypes.BOOL}:
-                stmt = self.parse_statement()
-                items.append(stmt)
-                continue
-            
-            # Check if this is a member declaration with potential modifiers    
-            if self.current_token.type in self.MODIFIER_TOKENS:
-                modifiers = self.parse_modifiers()
-                
-                # Check if this is a function declaration or variable
-                if self.current_token.type in {TokenTypes.IDENT, TokenTypes.STRING}:
-                    # For function declarations, check for empty parameter list
-                    if self.current_token.type == TokenTypes.IDENT:
-                        ident_value = self.current_token.value
-                        saved_token = self.current_token
-                        self.eat(TokenTypes.IDENT)
-                        
-                        # Check for empty parameter list: init()
-                        if self.current_token.type == TokenTypes.LPAREN and self.peek().type == TokenTypes.RPAREN:
-                            # This is a function with empty parameter list
-                            self.eat(TokenTypes.LPAREN)
-                            self.eat(TokenTypes.RPAREN)
-                            
-                            # Save current token position to restore if needed
-                            return_type = None
-                            if self.current_token.type == TokenTypes.ARROW:
-                                self.eat(TokenTypes.ARROW)
-                                return_type = self.parse_type()
-                            
-                            body = None
-                            if self.current_token.type == TokenTypes.LBRACE:
-                                body = self.parse_block()
-                            else:
-                                self.expect_semicolon()
-                                
-                            # Create function with empty parameter list
-                            location = saved_token.location if hasattr(saved_token, 'location') else None
-                            func = FunctionDef(
-                                modifiers=modifiers,
-                                name=ident_value,
-                                params=[],
-                                return_type=return_type,
-                                body=body,
-                                location=location
-                            )
-                            items.append(func)
-                            continue
-                        elif self.current_token.type == TokenTypes.LPAREN:
-                            # Normal function declaration with parameters
-                            # Restore token position
-                            self.current_token = saved_token
-                            items.append(self.parse_function_header(modifiers))
-                            continue
-                        else:
-                            # Not a function, restore token position
-                            self.current_token = saved_token
-                    
-                    # Look ahead to see if this is a function declaration or variable
-                    # Function declarations have parentheses after the name
-                    is_function = False
-                    if self.current_token.type == TokenTypes.IDENT:
-                        saved_token = self.current_token
-                        self.eat(TokenTypes.IDENT)
-                        if self.current_token.type == TokenTypes.LPAREN:
-                            is_function = True
-                            
-                        # Restore token
-                        self.current_token = saved_token
-                        
-                    if is_function:
-                        items.append(self.parse_function_header(modifiers))
-                    else:
-                        # Variable declaration 
-                        items.append(self.parse_variable(modifiers))
-                else:
-                    self.error(f"Unexpected token {self.current_token.type.name} in block")
-                continue
+                self.error("Unexpected end of file inside block", 'unexpected-eof')
+            try:
+                items.append(self.parse_block_item())
+            except ParseError as error:
+                if not self.recovering:
+                    raise
+                self.record_error(error)
+                # Resume after the next ';' of this block, or at its '}'
+                self.synchronize({TokenTypes.SEMICOLON, TokenTypes.RBRACE})
+                if self.current_token.type == TokenTypes.SEMICOLON:
+                    self.eat(TokenTypes.SEMICOLON)
             
-            # Check for field declarations (x: int;) without modifiers
-            if self.current_token.type == TokenTypes.IDENT and self.peek().type == TokenTypes.COLON:
-                var = self.parse_variable([TokenTypes.PRIV])  # default private
-                items.append(var)
-                continue
+        self.eat(TokenTypes.RBRACE)
+        return items
+
+    def parse_function_body(self) -> Union[List[Node], Deferred]:
+        """Parse a function body block.
+
+        In skeleton mode the block is only skipped, using the bracket
+        index, and a Deferred parses it from its first token when the body
+        is read. The parser (and its tokens) stay alive until then.
+        """
+        if not self.skeleton:
+            return self.parse_block()
+        start = self.current_pos
+        self.reset(self.matching_bracket(start) + 1)
+        return Deferred(functools.partial(self._parse_deferred_block, start))
+
+    def _parse_deferred_block(self, start: int) -> List[Node]:
+        """Parse the block starting at token start, keeping the current position"""
+        saved = self.mark()
+        self.reset(start)
+        try:
+            return self.parse_block()
+        finally:
+            self.reset(saved)
+
+    def parse_block_item(self) -> Node:
+        """Parse one statement or member declaration inside a block"""
+        # First, try to parse it as a statement (expressions, return, if, while, etc.)
+        if self.current_token.type in {TokenTypes.RETURN, TokenTypes.IF, TokenTypes.WHILE, 
+                                     TokenTypes.STRING, TokenTypes.INTEGER, TokenTypes.FLOAT, 
+                                     TokenTypes.BOOL}:
+            return self.parse_statement()
+        
+        # Check if this is a member declaration with potential modifiers    
+        if self.current_token.type in self.MODIFIER_TOKENS:
+            modifiers = self.parse_modifiers()
             
-            # Check for unmodified function declarations or function calls
-            if self.current_token.type == TokenTypes.IDENT:
-                ident_value = self.current_token.value
-                
-                # Special handling for functions with empty parameter lists: init()
-                if self.peek().type == TokenTypes.LPAREN:
-                    next_token = self.peek(2)  # Look two tokens ahead
+            # Check if this is a function declaration or variable
+            if self.current_token.type in {TokenTypes.IDENT, TokenTypes.STRING}:
+                # For function declarations, check for empty parameter list
+                if self.current_token.type == TokenTypes.IDENT:
+                    ident_value = self.current_token.value
+                    location = self.get_location()
+                    saved = self.mark()
+                    self.eat(TokenTypes.IDENT)
                     
-                    if next_token.type == TokenTypes.RPAREN:
+                    # Check for empty parameter list: init()
+                    if self.current_token.type == TokenTypes.LPAREN and self.peek().type == TokenTypes.RPAREN:
                         # This is a function with empty parameter list
-                        location = self.get_location()
-                        self.eat(TokenTypes.IDENT)
                         self.eat(TokenTypes.LPAREN)
                         self.eat(TokenTypes.RPAREN)
                         
-                        # Check if this is a function definition
-                        if self.current_token.type in {TokenTypes.LBRACE, TokenTypes.ARROW}:
-                            # Function definition
-                            return_type = None
-                            if self.current_token.type == TokenTypes.ARROW:
-                                self.eat(TokenTypes.ARROW)
-                                return_type = self.parse_type()
-                                
-                            # Parse body if present
-                            body = None
-                            if self.current_token.type == TokenTypes.LBRACE:
-                                body = self.parse_block()
-                            else:
-                                self.expect_semicolon()
-                                
-                            # Create function with empty parameter list
-                            func = FunctionDef(
-                                modifiers=[TokenTypes.PRIV],  # default private
-                                name=ident_value,
-                                params=[],
-                                return_type=return_type,
-                                body=body,
-                                location=location
-                            )
-                            items.append(func)
-                            continue
+                        # Save current token position to restore if needed
+                        return_type = None
+                        if self.current_token.type == TokenTypes.ARROW:
+                            self.eat(TokenTypes.ARROW)
+                            return_type = self.parse_type()
+                        
+                        body = None
+                        if self.current_token.type == TokenTypes.LBRACE:
+                            body = self.parse_function_body()
                         else:
-                            # Function call followed by semicolon
-                            ident = Identifier(name=ident_value, location=location)
-                            func_call = FunctionCall(
-                                function=ident,
-                                arguments=[],
-                                location=location
-                            )
-                            stmt = ExpressionStatement(expr=func_call, location=location)
                             self.expect_semicolon()
-                            items.append(stmt)
-                            continue
+                            
+                        # Create function with empty parameter list
+                        func = FunctionDef(
+                            modifiers=modifiers,
+                            name=ident_value,
+                            params=[],
+                            return_type=return_type,
+                            body=body,
+                            location=location
+                        )
+                        return func
+                    elif self.current_token.type == TokenTypes.LPAREN:
+                        # Normal function declaration with parameters
+                        # Restore token position
+                        self.reset(saved)
+                        return self.parse_function_header(modifiers)
+                    else:
+                        # Not a function, restore token position
+                        self.reset(saved)
                 
-                # Check if it might be a function definition without modifiers
-                if self.peek().type == TokenTypes.LPAREN:
-                    # We need to distinguish between function declarations and function calls
-                    # Let's look ahead to see if there's a block after the parameter list (indicating a function)
-                    saved_pos = self.lexer.pos
-                    saved_line = self.lexer.line
-                    saved_column = self.lexer.column
-                    saved_token = self.current_token
+                # Look ahead to see if this is a function declaration or variable
+                # Function declarations have parentheses after the name
+                is_function = False
+                if self.current_token.type == TokenTypes.IDENT:
+                    is_function = self.peek().type == TokenTypes.LPAREN
                     
-                    # Skip identifier and parenthesis
+                if is_function:
+                    return self.parse_function_header(modifiers)
+                # Variable declaration 
+                return self.parse_variable(modifiers)
+            self.error(f"Unexpected token {self.current_token.type.name} in block", 'unexpected-token')
+        
+        # Check for field declarations (x: int;) without modifiers
+        if self.current_token.type == TokenTypes.IDENT and self.peek().type == TokenTypes.COLON:
+            var = self.parse_variable([TokenTypes.PRIV])  # default private
+            return var
+        
+        # Check for unmodified function declarations or function calls
+        if self.current_token.type == TokenTypes.IDENT:
+            ident_value = self.current_token.value
+            
+            # Special handling for functions with empty parameter lists: init()
+            if self.peek().type == TokenTypes.LPAREN:
+                next_token = self.peek(2)  # Look two tokens ahead
+                
+                if next_token.type == TokenTypes.RPAREN:
+                    # This is a function with empty parameter list
+                    location = self.get_location()
                     self.eat(TokenTypes.IDENT)
                     self.eat(TokenTypes.LPAREN)
+                    self.eat(TokenTypes.RPAREN)
                     
-                    # Skip parameters until we reach closing paren
-                    while self.current_token.type != TokenTypes.RPAREN and self.current_token.type != TokenTypes.EOF:
-                        self.eat(self.current_token.type)
-                    
-                    if self.current_token.type == TokenTypes.RPAREN:
-                        self.eat(TokenTypes.RPAREN)
-                    
-                    # Check what follows the closing paren
-                    is_function_def = False
+                    # Check if this is a function definition
                     if self.current_token.type in {TokenTypes.LBRACE, TokenTypes.ARROW}:
-                        is_function_def = True
-                    elif self.current_token.type == TokenTypes.AS:
-                        is_function_def = False
+                        # Function definition
+                        return_type = None
+                        if self.current_token.type == TokenTypes.ARROW:
+                            self.eat(TokenTypes.ARROW)
+                            return_type = self.parse_type()
+                            
+                        # Parse body if present
+                        body = None
+                        if self.current_token.type == TokenTypes.LBRACE:
+                            body = self.parse_function_body()
+                        else:
+                            self.expect_semicolon()
+                            
+                        # Create function with empty parameter list
+                        func = FunctionDef(
+                            modifiers=[TokenTypes.PRIV],  # default private
+                            name=ident_value,
+                            params=[],
+                            return_type=return_type,
+                            body=body,
+                            location=location
+                        )
+                        return func
                     else:
-                        # If followed by semicolon, it's a function call
-                        is_function_def = False
-                    
-                    # Restore lexer state
-                    self.lexer.pos = saved_pos
-                    self.lexer.line = saved_line
-                    self.lexer.column = saved_column
-                    self.current_token = saved_token
-                    
-                    if is_function_def:
-                        # This is a function declaration without modifiers
-                        items.append(self.parse_function_header([TokenTypes.PRIV]))  # default private
-                        continue
-                
-                # If we get here, treat it as a general statement (function call or expression)
-                stmt = self.parse_statement()
-                items.append(stmt)
-                continue
+                        # Function call followed by semicolon
+                        ident = self.make(Identifier, location, ident_value)
+                        func_call = self.make(FunctionCall, location, ident, [])
+                        stmt = ExpressionStatement(expr=func_call, location=location)
+                        self.expect_semicolon()
+                        return stmt
             
-            # If we get here, try to parse it as a general statement
-            stmt = self.parse_statement()
-            items.append(stmt)
+            # Check if it might be a function definition without modifiers
+            if self.peek().type == TokenTypes.LPAREN:
+                # We need to distinguish between function declarations and function calls:
+                # a definition has a body or a return type after the parameter list
+                closing = self.matching_bracket(self.current_pos + 1)
+                is_function_def = self.token_at(closing + 1).type in {TokenTypes.LBRACE, TokenTypes.ARROW}
+                
+                if is_function_def:
+                    # This is a function declaration without modifiers
+                    return self.parse_function_header([TokenTypes.PRIV])  # default private
             
-        self.eat(TokenTypes.RBRACE)
-        return items 
\ No newline at end of file
+            # If we get here, treat it as a general statement (function call or expression)
+            return self.parse_statement()
+
+        
+        # If we get here, try to parse it as a general statement
+        return self.parse_statement()
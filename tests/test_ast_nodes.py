@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Test cases for AST node utilities.
+"""
+
+import gc
+import unittest
+import weakref
+
+from src.shard.ast_nodes import (
+    NodeVisitor, Program, Identifier, Literal, BinaryOp, FunctionDef, ReturnStatement,
+    ArenaTree, If, walk, iter_nodes, iter_child_nodes
+)
+from src.shard.lexer.tokens import TokenTypes
+from src.shard.lexer import Lexer
+from src.shard.parser import Parser
+
+
+def sample_program() -> Program:
+    """Parse a small program with nested expressions and blocks"""
+    source = (
+        "type A { x: int = 1; f(a: int) -> int { if (a > x) { return a; } return x + 2; } }\n"
+        "g() { print(y); }\n"
+    )
+    return Parser(Lexer(source)).parse()
+
+
+class ASTNodesTestCase(unittest.TestCase):
+    """Test cases for AST node utilities"""
+
+    def test_node_visitor(self):
+        """Test visitor dispatch and the default child walk"""
+        class NameCollector(NodeVisitor):
+            def __init__(self):
+                self.names = []
+                self.visited = []
+
+            def visit_Identifier(self, node):
+                self.names.append(node.name)
+
+            def generic_visit(self, node):
+                self.visited.append(type(node).__name__)
+                super().generic_visit(node)
+
+        collector = NameCollector()
+        collector.visit(sample_program())
+        self.assertEqual(collector.names, ["a", "x", "a", "x", "print", "y"])
+        self.assertEqual(collector.visited[:3], ["Program", "TypeDef", "VariableDef"])
+        self.assertNotIn("Identifier", collector.visited)
+
+        # accept() dispatches the same way, for any visitor object
+        class Echo:
+            def visit_Literal(self, node):
+                return node.value
+
+            def generic_visit(self, node):
+                return None
+
+        self.assertEqual(Literal(value=3, literal_type=TokenTypes.INTEGER).accept(Echo()), 3)
+        self.assertIsNone(Identifier(name="n").accept(Echo()))
+        self.assertEqual(Literal(value=4, literal_type=TokenTypes.INTEGER).accept(collector), None)
+
+        # Methods added after the first dispatch are picked up, in subclasses too
+        class Sub(NameCollector):
+            pass
+
+        sub = Sub()
+        literal = Literal(value=5, literal_type=TokenTypes.INTEGER)
+        self.assertIsNone(sub.visit(literal))
+        NameCollector.visit_Literal = lambda self, node: node.value
+        self.assertEqual(sub.visit(literal), 5)
+        del NameCollector.visit_Literal
+        self.assertIsNone(literal.accept(sub))
+
+        # The dispatch cache does not keep visitor classes alive
+        ref = weakref.ref(Sub)
+        del Sub, sub
+        gc.collect()
+        self.assertIsNone(ref())
+
+    def test_walk(self):
+        """Test the iterative walkers against the visitor and on deep trees"""
+        program = sample_program()
+        nodes = list(iter_nodes(program))
+        self.assertIs(nodes[0], program)
+        self.assertEqual([type(node).__name__ for node in iter_child_nodes(program)], ["TypeDef", "FunctionDef"])
+        names = [node.name for node in iter_nodes(program, types=Identifier)]
+        self.assertEqual(names, ["a", "x", "a", "x", "print", "y"])
+        self.assertEqual(len(list(iter_nodes(program, types=(BinaryOp, ReturnStatement)))), 4)
+
+        order = []
+        walk(program, pre=lambda node: order.append(("pre", type(node).__name__)),
+             post=lambda node: order.append(("post", type(node).__name__)))
+        self.assertEqual(order[:2], [("pre", "Program"), ("pre", "TypeDef")])
+        self.assertEqual(order[-2:], [("post", "FunctionDef"), ("post", "Program")])
+        self.assertEqual(len(order), 2 * len(nodes))
+
+        # pre returning False prunes the subtree and its post call
+        visited = []
+        walk(program, pre=lambda node: not isinstance(node, FunctionDef), post=visited.append)
+        self.assertFalse(any(isinstance(node, (FunctionDef, Identifier)) for node in visited))
+        self.assertIs(visited[-1], program)
+
+        # Far deeper than the recursion limit
+        expr = Identifier(name="x")
+        for _ in range(20000):
+            expr = BinaryOp(left=expr, operator=TokenTypes.PLUS, right=Literal(value=1, literal_type=TokenTypes.INTEGER))
+        self.assertEqual(sum(1 for _ in iter_nodes(expr, types=Literal)), 20000)
+        depth = [0, 0]
+        def enter(node):
+            depth[0] += 1
+            depth[1] = max(depth)
+        def leave(node):
+            depth[0] -= 1
+        walk(expr, pre=enter, post=leave)
+        self.assertEqual(depth, [0, 20001])
+
+    def test_arena_tree(self):
+        """Test the flat arena form: round trip, scans and cursor"""
+        program = sample_program()
+        arena = ArenaTree.from_program(program)
+        self.assertEqual(arena.to_program(), program)
+        rebuilt = arena.to_program()
+        self.assertEqual(rebuilt.declarations[0].location.line, 1)
+        self.assertEqual(rebuilt.declarations[1].location.column, 1)
+        self.assertIsInstance(rebuilt.declarations[0].modifiers, list)
+
+        # Pre-order handles: scans see nodes in the order iter_nodes does
+        names = [arena.field(handle, "name") for handle in arena.iter_nodes(Identifier)]
+        self.assertEqual(names, ["a", "x", "a", "x", "print", "y"])
+        self.assertEqual(len(list(arena.iter_nodes())), len(list(iter_nodes(program))))
+        [if_handle] = arena.iter_nodes(If)
+        self.assertIs(arena.kind(arena.field(if_handle, "else_block")), type(None))
+        self.assertEqual(arena.to_program(if_handle), program.declarations[0].members[1].body[0])
+        self.assertEqual(arena.location(if_handle).line, 1)
+
+        # Program -> declarations list -> TypeDef -> members list -> VariableDef
+        cursor = arena.cursor()
+        self.assertIs(cursor.kind, Program)
+        self.assertTrue(cursor.goto_first_child())
+        self.assertIs(cursor.kind, list)
+        self.assertTrue(cursor.goto_first_child())
+        self.assertEqual(cursor.field("name"), "A")
+        self.assertTrue(cursor.goto_first_child())
+        self.assertTrue(cursor.goto_first_child())
+        self.assertEqual((cursor.kind.__name__, cursor.field("name"), cursor.depth), ("VariableDef", "x", 4))
+        self.assertTrue(cursor.goto_next_sibling())
+        self.assertFalse(cursor.goto_next_sibling())
+        self.assertEqual(cursor.field("name"), "f")
+        while cursor.goto_parent():
+            pass
+        self.assertEqual((cursor.handle, cursor.depth), (0, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,6 +3,7 @@
 Test cases for AST encoders.
 """
 
+import sys
 import unittest
 import json
 from src.shard.ast_nodes import (
@@ -11,8 +12,12 @@ from src.shard.ast_nodes import (
     AssignmentExpr, MemberAccess, ExpressionStatement, ReturnStatement, Parameter,
     If, While, UnaryOp
 )
-from src.shard.encoders import encode_ast_as_json, encode_ast_as_alt
+from src.shard.encoders import (
+    encode_ast_as_json, encode_ast_as_alt, encode_ast_as_binary, decode_ast_from_binary
+)
 from src.shard.lexer.tokens import TokenTypes
+from src.shard.lexer import Lexer
+from src.shard.parser import Parser
 
 class EncodersTestCase(unittest.TestCase):
     """Test cases for AST encoders"""
@@ -109,6 +114,27 @@ class EncodersTestCase(unittest.TestCase):
         self.assertEqual(data["operator"], "MINUS")
         self.assertEqual(data["operand"]["value"], 42)
     
+    @unittest.skipIf(sys.version_info < (3, 10), "nodes are only slotted on 3.10+")
+    def test_encode_slotted_nodes(self):
+        """Test encoding nodes that have no per-instance __dict__"""
+        node = BinaryOp(
+            left=Identifier(name="a"),
+            operator=TokenTypes.PLUS,
+            right=Literal(value=1, literal_type=TokenTypes.INTEGER)
+        )
+        with self.assertRaises(AttributeError):
+            node.extra = True
+
+        with self.assertRaises(TypeError):
+            vars(node)
+        data = json.loads(encode_ast_as_json(node))
+        self.assertEqual(data, {
+            "type": "BinaryOp",
+            "left": {"type": "Identifier", "name": "a"},
+            "operator": "PLUS",
+            "right": {"type": "Literal", "value": 1, "literal_type": "INTEGER"},
+        })
+
     def test_encode_complex_program(self):
         """Test encoding a complex program with all node types"""
         program = Program(
@@ -238,5 +264,56 @@ class EncodersTestCase(unittest.TestCase):
         except json.JSONDecodeError:
             self.fail("JSON output is not valid JSON")
 
+    def test_binary_round_trip(self):
+        """Test that the binary format loads back the same tree"""
+        source = (
+            "pub type Counter from Base, Printable {\n"
+            "    count: int = -70000;\n"
+            "    pub increment(step: float = 0.25) -> int { count += step; if (!done) { print(\"héllo\", true); } }\n"
+            "}\n"
+            "impl Counter for Printable { f() { while (a.b.c(1)) { x = y; } return; } }\n"
+        )
+        lexer = Lexer(source)
+        program = Parser(lexer).parse()
+        data = encode_ast_as_binary(program)
+        self.assertTrue(data.startswith(b"SHAST"))
+
+        loaded = decode_ast_from_binary(data, lexer.lines)
+        self.assertEqual(loaded, program)
+        self.assertEqual(encode_ast_as_json(loaded), encode_ast_as_json(program))
+        method = loaded.declarations[0].members[1]
+        self.assertEqual((method.location.line, method.location.column), (3, 9))
+        self.assertEqual(method.params[0].default_value.value, 0.25)
+        self.assertIs(method.body[1].then_block[0].expr.arguments[1].value, True)
+
+        # Without locations: smaller, and every location is None
+        bare = encode_ast_as_binary(program, locations=False)
+        self.assertLess(len(bare), len(data))
+        loaded = decode_ast_from_binary(bare)
+        self.assertIsNone(loaded.declarations[1].members[0].location)
+        self.assertEqual(encode_ast_as_alt(loaded), encode_ast_as_alt(program))
+
+        # Skeleton-mode bodies are parsed on the way
+        skeleton = Parser(Lexer(source), skeleton=True).parse()
+        self.assertEqual(decode_ast_from_binary(encode_ast_as_binary(skeleton), lexer.lines), program)
+
+        # Nesting far beyond the recursion limit
+        expr = Identifier(name="x")
+        for _ in range(20000):
+            expr = UnaryOp(operator=TokenTypes.MINUS, operand=expr)
+        loaded = decode_ast_from_binary(encode_ast_as_binary(expr))
+        depth = 0
+        while isinstance(loaded, UnaryOp):
+            loaded = loaded.operand
+            depth += 1
+        self.assertEqual((depth, loaded.name), (20000, "x"))
+
+        with self.assertRaises(ValueError):
+            decode_ast_from_binary(b"PK" + data[2:])
+        with self.assertRaises(ValueError):
+            decode_ast_from_binary(data[:5] + bytes([99]) + data[6:])
+        with self.assertRaises(ValueError):
+            decode_ast_from_binary(data[:len(data) // 2])
+
 if __name__ == "__main__":
     unittest.main() 
\ No newline at end of file
@@ -10,7 +10,7 @@ from src.shard.lexer import Lexer, TokenTypes
 from src.shard.parser.expression_parser import ExpressionParser
 from src.shard.ast_nodes import (
     BinaryOp, UnaryOp, Literal, Identifier, FunctionCall, 
-    AssignmentExpr, MemberAccess
+    AssignmentExpr, MemberAccess, iter_nodes
 )
 from tests.test_framework import ShardTestCase
 
@@ -217,6 +217,123 @@ class ExpressionParserTestCase(ShardTestCase):
             self.assertIsInstance(expr.right, BinaryOp)
             self.assertEqual(expr.right.operator, TokenTypes.PLUS)
 
+        # Assignment is right-associative
+        expr = self.parse_expression("a = b = c")
+        self.assertIsInstance(expr, BinaryOp)
+        self.assertEqual(expr.operator, TokenTypes.ASSIGN)
+        self.assertIsInstance(expr.left, Identifier)
+        self.assertEqual(expr.left.name, "a")
+        self.assertIsInstance(expr.right, BinaryOp)
+        self.assertEqual(expr.right.operator, TokenTypes.ASSIGN)
+
+    def test_unary_operations(self):
+        """Test parsing prefix operators"""
+        expr = self.parse_expression("-x * !y.ready")
+        self.assertIsInstance(expr, BinaryOp)
+        self.assertEqual(expr.operator, TokenTypes.TIMES)
+
+        self.assertIsInstance(expr.left, UnaryOp)
+        self.assertEqual(expr.left.operator, TokenTypes.MINUS)
+        self.assertIsInstance(expr.left.operand, Identifier)
+
+        # Postfix member access binds tighter than the prefix operator
+        self.assertIsInstance(expr.right, UnaryOp)
+        self.assertEqual(expr.right.operator, TokenTypes.NOT)
+        self.assertIsInstance(expr.right.operand, MemberAccess)
+
+        expr = self.parse_expression("a - -b")
+        self.assertIsInstance(expr, BinaryOp)
+        self.assertIsInstance(expr.right, UnaryOp)
+
+    def test_postfix_chains(self):
+        """Test chains of member access and calls"""
+        expr = self.parse_expression("a.b(1).c(2)(3)")
+        self.assertIsInstance(expr, FunctionCall)
+        self.assertEqual(expr.arguments[0].value, 3)
+
+        inner = expr.function
+        self.assertIsInstance(inner, FunctionCall)
+        self.assertIsInstance(inner.function, MemberAccess)
+        self.assertEqual(inner.function.member.name, "c")
+
+        call = inner.function.object
+        self.assertIsInstance(call, FunctionCall)
+        self.assertIsInstance(call.function, MemberAccess)
+        self.assertEqual(call.function.object.name, "a")
+        self.assertEqual(call.function.member.name, "b")
+
+        expr = self.parse_expression("(a + b).c")
+        self.assertIsInstance(expr, MemberAccess)
+        self.assertIsInstance(expr.object, BinaryOp)
+
+    def test_iterative_mode(self):
+        """Test that the explicit-stack parser builds the same trees"""
+        sources = [
+            "a + b * c - d / e",
+            "x = y += -z * !w",
+            "(a + b) * (c - (d))",
+            "obj.field.method(1, g(2, 3), (x + y)).other",
+            "f()(a)(b, c)",
+            "a == b < c",
+        ]
+
+        for source in sources:
+            expected = self.parse_expression(source)
+            parser = ExpressionParser(Lexer(source), iterative_expressions=True)
+            self.assertEqual(parser.parse_expression(), expected, f"Tree mismatch for '{source}'")
+
+    def test_deep_nesting(self):
+        """Test that iterative mode handles nesting beyond the recursion limit"""
+        depth = 5000
+        source = "f(" * depth + "(x + 1)" + ")" * depth
+        parser = ExpressionParser(Lexer(source), iterative_expressions=True)
+        expr = parser.parse_expression()
+
+        for _ in range(depth):
+            self.assertIsInstance(expr, FunctionCall)
+            expr = expr.arguments[0]
+        self.assertIsInstance(expr, BinaryOp)
+
+    def test_hash_consing(self):
+        """Test that hash-consing shares equal subtrees and keeps locations aside"""
+        source = "a.b(1) + a.b(1) * f(a.b(1), 1.0, true)"
+        for iterative in (False, True):
+            parser = ExpressionParser(Lexer(source), hash_cons=True, iterative_expressions=iterative)
+            expr = parser.parse_expression()
+            factory = parser.node_factory
+
+            left, right = expr.left, expr.right
+            self.assertIs(left, right.left)
+            self.assertIs(left, right.right.arguments[0])
+            self.assertIs(left.arguments[0], right.right.arguments[0].arguments[0])
+            # 1, 1.0 and true stay distinct
+            literals = right.right.arguments[1:]
+            self.assertEqual([type(literal.value) for literal in literals], [float, bool])
+            self.assertIsNot(literals[0], left.arguments[0])
+
+            self.assertEqual(factory.structural_hash(left), factory.structural_hash(right.left))
+            self.assertNotEqual(factory.structural_hash(left), factory.structural_hash(right))
+            self.assertIsNone(left.location)
+            self.assertEqual([location.start for location in factory.locations_of(left)], [0, 9, 20])
+            self.assertEqual(factory.location_of(expr).start, 7)
+
+            # Same tree as a plain parse, apart from locations
+            expected = self.parse_expression(source)
+            for node in iter_nodes(expected):
+                node.location = None
+            self.assertEqual(expr, expected)
+
+        # A factory shared across files keeps each location's own line table
+        first = ExpressionParser(Lexer("a + b", "first.sd"), hash_cons=True)
+        first_expr = first.parse_expression()
+        second = ExpressionParser(Lexer("\n  a + b", "second.sd"), hash_cons=first.node_factory)
+        self.assertIs(second.parse_expression(), first_expr)
+        locations = first.node_factory.locations_of(first_expr)
+        self.assertEqual(
+            [(location.file, location.line, location.column) for location in locations],
+            [("first.sd", 1, 3), ("second.sd", 2, 5)],
+        )
+
 
 if __name__ == "__main__":
     unittest.main() 
\ No newline at end of file
@@ -9,7 +9,7 @@ import os
 import logging
 from typing import List, Dict, Any, Optional, Tuple
 
-from src.shard.lexer import Lexer, TokenTypes, Token
+from src.shard.lexer import Lexer, TokenTypes, Token, SymbolTable
 from src.shard.parser import Parser
 from src.shard.encoders.alt_encoder import encode_ast_as_alt
 
@@ -82,9 +82,9 @@ class ShardTestCase(unittest.TestCase):
         logging.debug(f"Parsing file: {filepath}")
         return self.parse_source(source, should_raise)
     
-    def _get_all_tokens(self, source: str) -> List[Token]:
+    def _get_all_tokens(self, source: str, symbols: Optional[SymbolTable] = None) -> List[Token]:
         """Get all tokens from the source without consuming them in the parser"""
-        lexer = Lexer(source)
+        lexer = Lexer(source, symbols=symbols)
         tokens = []
         
         token = lexer.get_next_token()
@@ -94,9 +94,9 @@ class ShardTestCase(unittest.TestCase):
             
         return tokens
     
-    def tokenize_source(self, source: str) -> List[Token]:
+    def tokenize_source(self, source: str, symbols: Optional[SymbolTable] = None) -> List[Token]:
         """Tokenize source code and return list of tokens"""
-        tokens = self._get_all_tokens(source)
+        tokens = self._get_all_tokens(source, symbols)
         
         # Log the tokens
         token_str = "\n".join([f"{t.type}: '{t.value}' at line {t.line}" for t in tokens])
@@ -3,10 +3,14 @@
 Test cases for the Shard lexer.
 """
 
+import io
+import random
 import unittest
+from unittest import mock
+from pathlib import Path
 from typing import List, Dict, Any
 
-from src.shard.lexer import Lexer, TokenTypes, Token
+from src.shard.lexer import Lexer, TokenTypes, Token, ParseError, LineTable, SymbolTable, TokenStream, StreamingLexer
 from tests.test_framework import ShardTestCase
 
 
@@ -134,6 +138,174 @@ class LexerTestCase(ShardTestCase):
             self.assertEqual(tokens[0].type, token_type, f"Expected token type {token_type} for '{punct}'")
             self.assertEqual(tokens[0].value, punct, f"Expected token value '{punct}'")
 
+    def test_string_escapes(self):
+        """Test lexer on escape sequences inside strings"""
+        tokens = self.tokenize_source(r'"a\nb\t\"q\"\\"')
+        self.assertEqual(len(tokens), 1, "Expected 1 token for escaped string")
+        self.assertEqual(tokens[0].type, TokenTypes.STRING)
+        self.assertEqual(tokens[0].value, 'a\nb\t"q"\\')
+
+        with self.assertRaises(SyntaxError):
+            self.tokenize_source('"unterminated')
+
+    def test_token_positions(self):
+        """Test offsets and resolved line/column across whitespace, comments and operators"""
+        tokens = self.tokenize_source("a->b\n  /* c\n */ x>=1.5 // tail\n\"s\"")
+        positions = [(t.type, t.value, t.line, t.column) for t in tokens]
+        self.assertEqual(positions, [
+            (TokenTypes.IDENT, "a", 1, 1),
+            (TokenTypes.ARROW, "->", 1, 2),
+            (TokenTypes.IDENT, "b", 1, 4),
+            (TokenTypes.IDENT, "x", 3, 5),
+            (TokenTypes.GE, ">=", 3, 6),
+            (TokenTypes.FLOAT, 1.5, 3, 8),
+            (TokenTypes.STRING, "s", 4, 1),
+        ])
+        spans = [(t.start, t.end) for t in tokens]
+        self.assertEqual(spans, [(0, 1), (1, 3), (3, 4), (16, 17), (17, 19), (19, 22), (31, 34)])
+
+    def test_line_table(self):
+        """Test resolving offsets to lines and columns"""
+        lines = LineTable("ab\n\ncd\n", "f.sd")
+        self.assertEqual(lines.line_starts, [0, 3, 4, 7])
+        self.assertEqual(lines.line_column(0), (1, 1))
+        self.assertEqual(lines.line_column(2), (1, 3))  # the newline itself
+        self.assertEqual(lines.line_column(3), (2, 1))
+        self.assertEqual(lines.line_column(5), (3, 2))
+        self.assertEqual(lines.line_column(7), (4, 1))  # end of input
+
+    def test_interned_names(self):
+        """Test that repeated names share one string object and symbol id"""
+        symbols = SymbolTable()
+        first = self.tokenize_source("count + count", symbols)
+        second = self.tokenize_source("type count", symbols)
+
+        self.assertIs(first[0].value, first[2].value)
+        self.assertIs(first[0].value, second[1].value)
+        self.assertEqual(symbols.symbol_id("count"), 0)
+        self.assertEqual(symbols.symbol_id("type"), 1)
+        self.assertEqual(symbols.name(1), "type")
+        self.assertEqual(len(symbols), 2)
+
+    def test_token_stream(self):
+        """Test that a TokenStream hands out the same tokens as the lexer"""
+        source = 'type A { pub f(x: int) -> bool { return x >= 2.5 == true; } s = "q\\n"; }'
+        stream = TokenStream.from_lexer(Lexer(source))
+        tokens = self.tokenize_source(source)
+
+        self.assertEqual(len(stream), len(tokens) + 1)
+        self.assertEqual(stream[-1].type, TokenTypes.EOF)
+        self.assertEqual([stream[i] for i in range(len(tokens))], tokens)
+        self.assertEqual(stream.kind(1), TokenTypes.IDENT)
+        self.assertEqual(stream.value(1), "A")
+        self.assertEqual(stream[1].column, 6)
+
+    def test_bytes_input(self):
+        """Test that bytes, mmap'd files and str input lex to the same tokens"""
+        source = 'naïve = "ünï\\n" + x\u00a0/* é */ -> 3.5; ñ٣ = 1'
+        fields = lambda tokens: [(t.type, t.value, t.line, t.column) for t in tokens]
+        tokens = self.tokenize_source(source)
+        byte_tokens = self.tokenize_source(source.encode("utf-8"))
+
+        self.assertEqual(fields(byte_tokens), fields(tokens))
+        self.assertEqual((byte_tokens[1].start, byte_tokens[1].end), (7, 8))  # '=' after a 2-byte 'ï'
+
+        path = Path(self.get_test_file_path("complex.sd"))
+        self.assertEqual(
+            fields(self.tokenize_source(path)),
+            fields(self.tokenize_source(path.read_text())),
+        )
+
+        with self.assertRaises(ParseError) as context:
+            self.tokenize_source("a →".encode("utf-8"))
+        error = context.exception
+        self.assertEqual((error.code, error.message), ('invalid-character', "Invalid character '→'"))
+        self.assertEqual((error.start, error.end), (2, 5))
+        self.assertEqual(error.render(), "<unknown>:1:3: error[invalid-character]: Invalid character '→'\n    a →\n      ^")
+
+    def test_incremental_relex(self):
+        """Test that edits re-lex only the affected tokens"""
+        source = "a = b; /* note */ c -> d;\nx = \"s\";"
+        stream = TokenStream.from_lexer(Lexer(source))
+        fields = lambda stream: [(t.type, t.value, t.start, t.end) for t in (stream[i] for i in range(len(stream)))]
+
+        edits = [
+            (1, 0, "bc"),         # extend an identifier
+            (22, 1, "-="),        # '->' becomes '-=' '>'
+            (4, 0, "/*"),         # open a comment that swallows '= b;'
+            (4, 2, ""),           # and drop it again
+            (0, 0, '"a;b" '),     # a string containing a separator
+            (32, 3, ""),          # join the lines, dropping 'd;'
+        ]
+        for offset, removed, inserted in edits:
+            text = stream.lines.text
+            text = text[:offset] + inserted + text[offset + removed:]
+            stream.apply_edit(offset, removed, inserted)
+            self.assertEqual(fields(stream), fields(TokenStream.from_lexer(Lexer(text))), repr(text))
+
+        stream = TokenStream.from_lexer(Lexer(source))
+        self.assertEqual(stream.apply_edit(4, 1, "bb"), (2, 1, 1))
+
+        # Edits jumping back and forth over the pending shift, and literal
+        # slots reused instead of piling up
+        source = "x = 1; y = \"a\"; z = 2.5;\n" * 20
+        stream = TokenStream.from_lexer(Lexer(source))
+        rng = random.Random(14)
+        for step in range(200):
+            text = stream.lines.text
+            offset = rng.randrange(len(text) - 1)
+            if text[offset].isdigit():
+                removed, inserted = 1, rng.choice(["7", "42", ""])
+            elif text.count('"', 0, offset) % 2:
+                removed, inserted = 0, " "  # inside a string
+            else:
+                removed, inserted = 0, rng.choice([" ", "\n", "9 "])
+            text = text[:offset] + inserted + text[offset + removed:]
+            stream.apply_edit(offset, removed, inserted)
+            expected = TokenStream.from_lexer(Lexer(text))
+            self.assertEqual(fields(stream), fields(expected), repr(text))
+            self.assertEqual(stream.end(-1), len(text))
+            # Every slot holds a live literal or is free
+            self.assertEqual(len(stream.literals) - len(stream.free_literals), len(expected.literals))
+
+        # Retyping one literal over and over keeps the table as it is
+        stream = TokenStream.from_lexer(Lexer(source))
+        table_size = len(stream.literals)
+        offset = stream.start(2)
+        for step in range(50):
+            stream.apply_edit(offset, stream.end(2) - offset, str(step))
+        self.assertEqual(stream.value(2), 49)
+        self.assertEqual(len(stream.literals), table_size)
+
+    def test_streaming(self):
+        """Test that chunked input lexes the same as the whole text"""
+        source = 'f(a) -> b == "x\\\n\\"y" /* c\n */ // é\n 3.25 >= ñ'
+        fields = lambda tokens: [(t.type, t.value, t.start, t.end, t.line, t.column) for t in tokens]
+        expected = fields(self.tokenize_source(source))
+
+        for size in (1, 2, 3, 5, 64):
+            chunks = [source[i:i + size] for i in range(0, len(source), size)]
+            tokens = list(StreamingLexer(chunks))
+            self.assertEqual(tokens[-1].type, TokenTypes.EOF)
+            self.assertEqual(fields(tokens[:-1]), expected, f"chunk size {size}")
+
+            # Byte chunks may split a multi-byte character
+            tokens = list(StreamingLexer(io.BytesIO(source.encode("utf-8")), chunk_size=size))
+            self.assertEqual(fields(tokens[:-1]), expected, f"byte chunk size {size}")
+
+        # A comment spanning many chunks is re-lexed in ever larger windows,
+        # not once per chunk
+        comment = "/* " + "x" * 4000 + " */"
+        source = "a " + comment + " b"
+        with mock.patch("src.shard.lexer.streaming.Lexer", wraps=Lexer) as window:
+            tokens = list(StreamingLexer(io.StringIO(source), chunk_size=16))
+        self.assertEqual(fields(tokens[:-1]), fields(self.tokenize_source(source)))
+        self.assertLess(window.call_count, 20)
+
+        with self.assertRaises(SyntaxError) as context:
+            list(StreamingLexer(["a\n  b \"op", "en\n c"]))
+        self.assertEqual(str(context.exception), "<stream>:2:5: error[unterminated-string]: Unterminated string")
+
     def test_complete_program(self):
         """Test lexer on a complete program"""
         program = """
@@ -3,15 +3,18 @@
 Test cases for the full Shard parser.
 """
 
+import random
 import unittest
 import logging
 from typing import List, Dict, Any
 
-from src.shard.lexer import TokenTypes
+from src.shard.lexer import Lexer, TokenTypes, TokenStream, StreamingLexer
+from src.shard.parser import Parser, IncrementalParser, ParseError, parse_parallel
 from src.shard.ast_nodes import (
     Program, TypeDef, ShardDef, ImplDef, FunctionDef, VariableDef,
     ComponentInstantiation, Parameter
 )
+from src.shard.encoders.alt_encoder import encode_ast_as_alt
 from tests.test_framework import ShardTestCase
 
 
@@ -105,6 +108,29 @@ class FullParserTestCase(ShardTestCase):
         self.assertIsInstance(ast.declarations[0].members[2], FunctionDef, "Expected FunctionDef")
         self.assertEqual(ast.declarations[0].members[2].name, "reset", "Expected method name 'reset'")
 
+    def test_modified_members(self):
+        """Test parsing members that combine modifiers with lookahead"""
+        source = """
+        shard Motor {
+            pub speed: float;
+            pub spin(rate: float) -> float {
+                return rate;
+            }
+        }
+        """
+        ast, messages = self.parse_source(source)
+        self.assert_no_errors(ast)
+        members = ast.declarations[0].members
+        self.assertEqual(len(members), 2, "Expected 2 members")
+
+        self.assertIsInstance(members[0], VariableDef, "Expected VariableDef")
+        self.assertEqual(members[0].type_name, "float", "Expected field type 'float'")
+
+        self.assertIsInstance(members[1], FunctionDef, "Expected FunctionDef")
+        self.assertEqual(members[1].name, "spin", "Expected method name 'spin'")
+        self.assertEqual([p.name for p in members[1].params], ["rate"], "Expected parameter 'rate'")
+        self.assertEqual(members[1].return_type, "float", "Expected return type 'float'")
+
     def test_impl_definition(self):
         """Test parsing impl definitions"""
         source = """
@@ -174,6 +200,343 @@ class FullParserTestCase(ShardTestCase):
         self.assertEqual(ast.declarations[0].instance_name, "myCounter", "Expected instance_name 'myCounter'")
         self.assertEqual(len(ast.declarations[0].args), 1, "Expected 1 argument")
 
+    def test_nested_call_lookahead(self):
+        """Test call/definition/instantiation decisions across nested parentheses"""
+        source = """
+        Motor(scale(1, (2 + 3)), 4) as motor;
+        type Car {
+            start(speed: float = limit(10)) {
+                log(format("start", (speed)));
+            }
+        }
+        """
+        ast, messages = self.parse_source(source)
+        self.assert_no_errors(ast)
+        self.assertIsInstance(ast.declarations[0], ComponentInstantiation, "Expected ComponentInstantiation")
+        self.assertEqual(len(ast.declarations[0].args), 2, "Expected 2 arguments")
+
+        start = ast.declarations[1].members[0]
+        self.assertIsInstance(start, FunctionDef, "Expected FunctionDef")
+        self.assertEqual(start.params[0].name, "speed", "Expected parameter 'speed'")
+        self.assertEqual(len(start.body), 1, "Expected 1 statement in body")
+
+    def test_mark_reset(self):
+        """Test rewinding the parser to a checkpoint"""
+        lexer = Lexer("f(a, (b)) { }")
+        parser = Parser(lexer)
+        checkpoint = parser.mark()
+        parser.eat(TokenTypes.IDENT)
+        parser.eat(TokenTypes.LPAREN)
+        self.assertEqual(parser.current_token.value, "a")
+
+        parser.reset(checkpoint)
+        self.assertEqual(parser.current_token.value, "f")
+        self.assertEqual(parser.matching_bracket(1), 7, "Expected ')' at index 7 to close '(' at index 1")
+        self.assertEqual(parser.matching_bracket(4), 6, "Expected ')' at index 6 to close '(' at index 4")
+        self.assertEqual(parser.matching_bracket(8), 9, "Expected '}' at index 9 to close '{' at index 8")
+
+    def test_packrat_mode(self):
+        """Test that packrat mode memoizes speculative parses"""
+        source = "a + b * c; f(x);"
+        parser = Parser(Lexer(source), packrat=True)
+
+        self.assertIsNone(parser.speculate(parser.parse_function_header, [TokenTypes.PRIV]))
+        self.assertIsNone(parser.speculate(parser.parse_function_header, [TokenTypes.PRIV]))
+        self.assertEqual(parser.memo_hits, 1, "Expected the failed header parse to be replayed")
+
+        expr = parser.parse_expression()
+        self.assertEqual(parser.current_token.type, TokenTypes.SEMICOLON)
+        parser.reset(0)
+        self.assertIs(parser.parse_expression(), expr, "Expected the memoized expression")
+        self.assertEqual(parser.current_token.type, TokenTypes.SEMICOLON)
+        self.assertEqual(parser.memo_hits, 2)
+
+        # An ambiguous prefix: the failed header parse leaves "a * b" (a
+        # parameter default) memoized, and the expression parse reuses it
+        source = "f(x = a * b) + 1;"
+        parser = Parser(Lexer(source), packrat=True)
+        self.assertIsNone(parser.speculate(parser.parse_function_header, [TokenTypes.PRIV]))
+        hits = parser.memo_hits
+        expr = parser.parse_expression()
+        self.assertEqual(parser.memo_hits, hits + 1)
+        self.assertEqual(expr, Parser(Lexer(source)).parse_expression())
+
+        # Replayed failures are new exceptions without the original frames
+        parser = Parser(Lexer("f() { x = ; }"), packrat=True)
+        errors = []
+        for _ in range(2):
+            parser.reset(0)
+            try:
+                parser.parse_function_header([TokenTypes.PRIV])
+            except ParseError as error:
+                errors.append(error)
+        self.assertEqual(parser.memo_hits, 1)
+        self.assertIsNot(errors[0], errors[1])
+        self.assertEqual(str(errors[0]), str(errors[1]))
+        self.assertFalse(any(isinstance(failure, BaseException) for _, _, failure in parser.memo.values()))
+
+        # A failure memoized while speculating is not replayed in recovery mode
+        parser = Parser(Lexer("f() { x = ; }"), packrat=True)
+        parser.recovering = True
+        self.assertIsNone(parser.speculate(parser.parse_function_header, [TokenTypes.PRIV]))
+        self.assertEqual(parser.parse_function_header([TokenTypes.PRIV]).name, "f")
+        self.assertEqual(len(parser.errors), 1)
+
+        # The memo table is bounded and evicts the least recently used entry
+        program = "x: int = a + b * c;\ntype T { f(n: int) { return n * (n - 1); } }"
+        parser = Parser(Lexer(program), packrat=True, memo_size=2)
+        parser.parse()
+        self.assertLessEqual(len(parser.memo), 2)
+
+        self.assertEqual(
+            encode_ast_as_alt(Parser(Lexer(program), packrat=True).parse()),
+            encode_ast_as_alt(Parser(Lexer(program)).parse()),
+        )
+
+    def test_unbalanced_brackets(self):
+        """Test that the bracket pre-scan reports the offending bracket"""
+        cases = {
+            "type A {\n  f() {\n}": ('unclosed-bracket', 1, 8, "Unclosed '{'"),
+            "f(a));": ('unmatched-bracket', 1, 5, "Unmatched ')'"),
+            "type A {\n  f(a};\n}": ('mismatched-bracket', 2, 6, "Mismatched '}', expected ')' to close '('"),
+        }
+
+        for source, (code, line, column, message) in cases.items():
+            # Brackets are only paired once parsing needs them
+            parser = Parser(Lexer(source, "b.sd"))
+            with self.assertRaises(ParseError) as context:
+                parser.parse()
+            error = context.exception
+            self.assertEqual((error.code, error.message), (code, message))
+            self.assertEqual((error.token.line, error.token.column), (line, column))
+            self.assertTrue(str(error).startswith(f"b.sd:{line}:{column}: error[{code}]: {message}\n"))
+
+    def test_token_stream_input(self):
+        """Test parsing from a pre-lexed TokenStream"""
+        with open(self.get_test_file_path("complex.sd")) as f:
+            program = f.read()
+
+        self.assertEqual(
+            Parser(TokenStream.from_lexer(Lexer(program))).parse(),
+            Parser(Lexer(program)).parse(),
+        )
+
+        parser = Parser(TokenStream.from_lexer(Lexer("type A {\n  f(a};\n}")))
+        with self.assertRaises(ParseError) as context:
+            parser.parse()
+        self.assertEqual(context.exception.code, 'mismatched-bracket')
+        self.assertEqual((context.exception.token.line, context.exception.token.column), (2, 6))
+
+    def test_source_locations(self):
+        """Test that node locations are offsets resolved through the line table"""
+        program = 'type A {\n    greeting: string = "hi";\n}'
+        ast = Parser(Lexer(program, "a.sd")).parse()
+        variable = ast.declarations[0].members[0]
+
+        self.assertEqual((variable.location.start, variable.location.end), (13, 21))
+        self.assertEqual((variable.location.line, variable.location.column), (2, 5))
+        self.assertEqual(variable.location.file, "a.sd")
+        self.assertEqual(variable.value.location.length, len('"hi"'))
+
+    def test_incremental_reparse(self):
+        """Test that edits reparse one subtree and agree with a full reparse"""
+        with open("tests/test_files/complex.sd") as f:
+            source = f.read()
+
+        def full_parse(text):
+            try:
+                return Parser(Lexer(text)).parse()
+            except SyntaxError:
+                return None
+
+        # Changing a name inside one member only reparses that member
+        incremental = IncrementalParser(source)
+        incremental.parse()
+        offset = source.index("count")
+        program = incremental.edit(offset, len("count"), "total")
+        self.assertEqual(incremental.reparsed, 1)
+        self.assertEqual(program, full_parse(incremental.text))
+
+        rng = random.Random(15)
+        pieces = ["", "x", "1", " ", "\n", ";", "{", "}", "(", ")", "+", "// c\n", "return 1;", "y = 2;"]
+        for trial in range(40):
+            incremental = IncrementalParser(source)
+            incremental.parse()
+            text = source
+            for step in range(3):
+                offset = rng.randrange(len(text) + 1)
+                removed = min(rng.choice([0, 1, 3]), len(text) - offset)
+                inserted = rng.choice(pieces)
+                text = text[:offset] + inserted + text[offset + removed:]
+                try:
+                    program = incremental.edit(offset, removed, inserted)
+                except SyntaxError:
+                    program = None
+                expected = full_parse(text)
+                self.assertEqual(program, expected, f"edit {(offset, removed, inserted)!r}")
+                if program is not None:
+                    # Reused nodes resolve to the same lines and columns
+                    for declaration, fresh in zip(program.declarations, expected.declarations):
+                        self.assertEqual(
+                            (declaration.location.line, declaration.location.column),
+                            (fresh.location.line, fresh.location.column),
+                        )
+
+        # Shared nodes keep their locations outside the tree, out of reach
+        # of the shift after an edit
+        with self.assertRaises(ValueError):
+            IncrementalParser(source, hash_cons=True)
+
+    def test_parallel_parse(self):
+        """Test that parsing declarations in worker processes matches a serial parse"""
+        with open("tests/test_files/complex.sd") as f:
+            source = f.read()
+        expected = Parser(Lexer(source, "complex.sd")).parse()
+
+        # chunk_size=1 puts every declaration in a chunk of its own
+        for text in (source, source.encode()):
+            program = parse_parallel(text, "complex.sd", workers=2, chunk_size=1)
+            self.assertEqual(program, expected)
+            for declaration, serial in zip(program.declarations, expected.declarations):
+                self.assertEqual(
+                    (declaration.location.line, declaration.location.column, declaration.location.file),
+                    (serial.location.line, serial.location.column, serial.location.file),
+                )
+
+        # Errors are reported as the serial parser reports them
+        broken = source + "\ntype B { x: int = ; }\n"
+        with self.assertRaises(SyntaxError) as serial_error:
+            Parser(Lexer(broken)).parse()
+        with self.assertRaises(SyntaxError) as parallel_error:
+            parse_parallel(broken, workers=2, chunk_size=1)
+        self.assertEqual(
+            str(parallel_error.exception).splitlines()[0],
+            str(serial_error.exception).splitlines()[0],
+        )
+
+    def test_skeleton_mode(self):
+        """Test that skeleton mode parses function bodies on first access"""
+        with open("tests/test_files/complex.sd") as f:
+            source = f.read()
+        expected = Parser(Lexer(source)).parse()
+        program = Parser(TokenStream.from_lexer(Lexer(source)), skeleton=True).parse()
+
+        counter = program.declarations[1]
+        increment = counter.members[2]
+        self.assertEqual(increment.name, "increment")
+        self.assertTrue(FunctionDef.body.is_deferred(increment))
+        self.assertEqual(increment.body, expected.declarations[1].members[2].body)
+        self.assertFalse(FunctionDef.body.is_deferred(increment))
+
+        # Reading every body gives the same tree as a full parse
+        self.assertEqual(program, expected)
+
+        # A broken body only fails when it is read
+        program = Parser(Lexer("f() { return 1 + ; }"), skeleton=True).parse()
+        self.assertEqual(program.declarations[0].name, "f")
+        with self.assertRaises(SyntaxError):
+            program.declarations[0].body
+
+    def test_iter_declarations(self):
+        """Test that declarations are yielded one by one without keeping their tokens"""
+        unit = "type P{n} {{ x: int = {n}; get() -> int {{ return x + 1; }} }}\nP{n}() as p{n};\n"
+        source = "".join(unit.format(n=n) for n in range(200))
+        expected = Parser(Lexer(source)).parse().declarations
+
+        parser = Parser(StreamingLexer(source[i:i + 100] for i in range(0, len(source), 100)))
+        declarations = []
+        for declaration in parser.iter_declarations():
+            declarations.append(declaration)
+            self.assertLess(len(parser.token_buffer), 2 * parser.LEX_BATCH)
+        self.assertEqual(declarations, expected)
+        self.assertEqual(declarations[-1].location.line, 400)
+
+    def test_error_recovery(self):
+        """Test that recovery mode reports every error and keeps what parsed"""
+        source = (
+            "type A {\n"
+            "    x: int = ;\n"
+            "    y: int = 2;\n"
+            "    f() { return 1 +; z = 3; }\n"
+            "}\n"
+            "g(a: ) -> int { return a; }\n"
+            "shard S { ok: int; }\n"
+            "h() { if (x) { y = ; } w = 1; }\n"
+        )
+        program, errors = Parser(Lexer(source)).parse_with_recovery()
+
+        self.assertEqual(
+            [(error.token.line, error.token.column) for error in errors],
+            [(2, 14), (4, 21), (6, 6), (8, 20)],
+        )
+        self.assertTrue(all(isinstance(error, ParseError) for error in errors))
+        self.assertEqual([d.name for d in program.declarations], ["A", "S", "h"])
+        type_a = program.declarations[0]
+        self.assertEqual([member.name for member in type_a.members], ["y", "f"])
+        self.assertEqual(len(type_a.members[1].body), 1)
+        self.assertEqual(len(program.declarations[2].body), 2)
+
+        # Without recovery the first error is raised
+        with self.assertRaises(ParseError) as context:
+            Parser(Lexer(source)).parse()
+        self.assertEqual(context.exception.token.line, 2)
+
+    def test_recovery_from_unbalanced_input(self):
+        """Test that bracket and lexer errors are recovered from like any other"""
+        # A stray ')' is one error and is skipped
+        program, errors = Parser(Lexer("f(a));\ng(b);")).parse_with_recovery()
+        self.assertEqual([(error.code, error.token.column) for error in errors], [('unmatched-bracket', 5)])
+        self.assertEqual([d.name for d in program.declarations], ["f", "g"])
+
+        source = (
+            "type A { x: int = f(1 }\n"    # '}' closes the '{' and the '('
+            "y: int = 1 @ 2;\n"               # rejected by the lexer
+            "type B { z: int = 3; }\n"
+            "type C { f() { w = 1; }\n"       # never closed
+        )
+        program, errors = Parser(Lexer(source)).parse_with_recovery()
+        self.assertEqual(
+            [(error.code, error.token.line, error.token.column) for error in errors],
+            [('mismatched-bracket', 1, 23), ('invalid-character', 2, 12), ('unclosed-bracket', 4, 8)],
+        )
+        self.assertIn("B", [d.name for d in program.declarations])
+
+        # A TokenStream keeps its stray bracket, but it is still reported once
+        program, errors = Parser(TokenStream.from_lexer(Lexer("f(a));\ng(b);"))).parse_with_recovery()
+        self.assertEqual([error.code for error in errors], ['unmatched-bracket'])
+        self.assertEqual([d.name for d in program.declarations], ["g"])
+
+        # Without recovery, lexer errors past the current token wait until
+        # the parser gets there
+        parser = Parser(Lexer("a + b @"))
+        self.assertEqual(parser.parse_expression().operator, TokenTypes.PLUS)
+        with self.assertRaises(ParseError) as context:
+            parser.expect_semicolon()
+        self.assertEqual(context.exception.code, 'invalid-character')
+
+    def test_parse_error_rendering(self):
+        """Test that parse errors are structured and rendered with a caret"""
+        source = "type A {\n\tx: int = 1 +;\n}"
+        with self.assertRaises(ParseError) as context:
+            Parser(Lexer(source, "a.sd")).parse()
+        error = context.exception
+        self.assertEqual(error.code, "unexpected-token")
+        self.assertEqual(error.message, "Unexpected token SEMICOLON")
+        self.assertEqual((error.start, error.end), (22, 23))
+        self.assertIsNone(error.stack)
+        self.assertEqual(
+            str(error),
+            "a.sd:2:14: error[unexpected-token]: Unexpected token SEMICOLON\n"
+            "    \tx: int = 1 +;\n"
+            "    \t            ^",
+        )
+
+        # The parser's stack is only captured in debug mode
+        with self.assertRaises(ParseError) as context:
+            Parser(Lexer(source, "a.sd"), debug=True).parse()
+        self.assertIn("parse_expression", context.exception.stack)
+        self.assertIn("Parser stack", str(context.exception))
+
     def test_complex_program(self):
         """Test parsing a complex program"""
         # Use one of our existing test files